@@ -0,0 +1,203 @@
+import json
+import sys
+
+from flask import Blueprint, abort, current_app, request
+from artists import artist_page, load_artist_schedule
+from availability import availability_page
+from bulk import ImportReport
+from cache import cached_page, conditional, schedule_detail
+from models import db, Artist, Venue
+from routing import read_only
+from scheduling import booking_window, schedule_shows, validate_rows
+from search import search_results
+from shows import show_page, show_search_page
+from venues import load_venue_schedule, venue_areas
+
+blueprint = Blueprint("api", __name__, url_prefix="/api/v1")
+
+#----------------------------------------------------------------------------#
+# API.
+#----------------------------------------------------------------------------#
+
+
+def api_response(data):
+    return current_app.response_class(
+        json.dumps(data, default=lambda value: value.isoformat()),
+        mimetype="application/json")
+
+
+def api_page(page):
+    return api_response({
+        "data": [row._asdict() for row in page.rows],
+        "page_size": page.page_size,
+        "prev_cursor": page.prev_cursor,
+        "next_cursor": page.next_cursor
+    })
+
+
+@blueprint.route('/venues')
+@read_only
+@cached_page("venues", "shows")
+@conditional
+def api_venues():
+    try:
+        return api_response({"areas": venue_areas()})
+    except:
+        abort(500)
+
+
+@blueprint.route('/venues/search')
+@read_only
+@cached_page("venues", "shows")
+@conditional
+def api_search_venues():
+    return api_response(search_results(
+        Venue, request.args.get("search_term", ""),
+        request.args.get("page", 1, type=int)))
+
+
+def api_availability(kind):
+    try:
+        page = availability_page(kind, request.args)
+    except ValueError as e:
+        abort(400, str(e))
+    return api_response({
+        "data": page.rows,
+        "page_size": page.page_size,
+        "next_cursor": page.next_cursor
+    })
+
+
+@blueprint.route('/venues/availability')
+@read_only
+@cached_page("venues", "shows")
+@conditional
+def api_venue_availability():
+    """Venues free to book between `start` and `end` (YYYY-MM-DD), with
+    their free slots; optionally in a `city`, `state` and `genre`. Pages
+    go forward only, with `after`."""
+    return api_availability("venues")
+
+
+@blueprint.route('/venues/<int:venue_id>')
+@read_only
+@cached_page("venue:{venue_id}")
+@conditional
+def api_show_venue(venue_id):
+    try:
+        return api_response(schedule_detail(
+            "venue", venue_id, lambda: load_venue_schedule(venue_id)))
+    except ValueError as e:
+        abort(404, str(e))
+    except:
+        abort(500)
+
+
+@blueprint.route('/artists')
+@read_only
+@cached_page("artists")
+@conditional
+def api_artists():
+    try:
+        return api_page(artist_page(request.args))
+    except ValueError as e:
+        abort(400, str(e))
+    except:
+        abort(500)
+
+
+@blueprint.route('/artists/search')
+@read_only
+@cached_page("artists", "shows")
+@conditional
+def api_search_artists():
+    return api_response(search_results(
+        Artist, request.args.get("search_term", ""),
+        request.args.get("page", 1, type=int)))
+
+
+@blueprint.route('/artists/availability')
+@read_only
+@cached_page("artists", "shows")
+@conditional
+def api_artist_availability():
+    """Artists free between `start` and `end`, as for venues."""
+    return api_availability("artists")
+
+
+@blueprint.route('/artists/<int:artist_id>')
+@read_only
+@cached_page("artist:{artist_id}")
+@conditional
+def api_show_artist(artist_id):
+    try:
+        return api_response(schedule_detail(
+            "artist", artist_id, lambda: load_artist_schedule(artist_id)))
+    except ValueError as e:
+        abort(404, str(e))
+    except:
+        abort(500)
+
+
+@blueprint.route('/shows')
+@read_only
+@cached_page("shows", "venues", "artists")
+@conditional
+def api_shows():
+    try:
+        return api_page(show_page(request.args))
+    except ValueError as e:
+        abort(400, str(e))
+    except:
+        abort(500)
+
+
+@blueprint.route('/shows/search')
+@read_only
+@cached_page("shows", "venues", "artists")
+@conditional
+def api_search_shows():
+    try:
+        return api_page(show_search_page(
+            request.args.get("search_term", ""), request.args))
+    except ValueError as e:
+        abort(400, str(e))
+    except:
+        abort(500)
+
+
+@blueprint.route('/shows/batch', methods=['POST'])
+def api_schedule_shows():
+    """Books a tour: {"shows": [{"venue_id", "artist_id", "start_time"},
+    ...], "strict": false, "window_minutes": 180}. Responds with the
+    number booked and the rejected rows, numbered from 1; 409 when
+    `strict` left everything unbooked."""
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict) or not isinstance(body.get("shows"), list):
+        abort(400, 'expected a JSON object with a "shows" list')
+    if len(body["shows"]) > current_app.config["SHOW_BATCH_MAX_ROWS"]:
+        abort(400, f"at most {current_app.config['SHOW_BATCH_MAX_ROWS']} shows per batch")
+    if not all(isinstance(show, dict) for show in body["shows"]):
+        abort(400, "each show must be a JSON object")
+    strict = bool(body.get("strict", False))
+    try:
+        window = booking_window(body.get("window_minutes"))
+    except (TypeError, ValueError, OverflowError):
+        abort(400, "window_minutes must be a number of minutes, 0 or more")
+    try:
+        report = ImportReport()
+        values = validate_rows(body["shows"], report)
+        report = schedule_shows(values, window, strict, report)
+    except:
+        db.session.rollback()
+        print(sys.exc_info())
+        abort(500)
+    finally:
+        db.session.close()
+    response = api_response({
+        "scheduled": report.imported,
+        "rejected": [{"row": line, "errors": errors} for line, errors in report.errors]
+    })
+    if strict and report.errors:
+        response.status_code = 409
+    return response
@@ -0,0 +1,215 @@
+from flask import (Blueprint, abort, current_app, flash, jsonify, redirect,
+                   render_template, request, url_for)
+from cache import cached_page, invalidate_pages, schedule_detail, ShowSchedule
+from forms import ArtistForm
+from models import db, artist_genres, genre_names, split_genre_names, Artist, Show, Venue
+from pagination import keyset_paginate
+from routing import read_only
+from search import search_results
+from streaming import stream_template
+
+blueprint = Blueprint("artists", __name__)
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+
+#  Artists
+#  ----------------------------------------------------------------
+
+
+def artist_page(args, stream=False):
+    return keyset_paginate(
+        Artist.query.with_entities(Artist.id, Artist.name),
+        [Artist.id], args, stream=stream)
+
+
+@blueprint.route('/artists')
+@read_only
+@cached_page("artists")
+def artists():
+    data = []
+    stream = current_app.config["STREAM_LISTINGS"]
+    try:
+        page = artist_page(request.args, stream)
+        # a streamed page's rows are only read as the template renders
+        data = page.rows if stream else [artist._asdict() for artist in page.rows]
+    except ValueError as e:
+        flash(f"An error occurred: {e}")
+        abort(400)
+    except:
+        flash("An error occurred")
+        abort(500)
+    render = stream_template if stream else render_template
+    return render('pages/artists.html', artists=data, page=page)
+
+
+@blueprint.route('/artists/search', methods=['POST'])
+@read_only
+def search_artists():
+    search_term = request.form.get("search_term", "")
+    response = search_results(
+        Artist, search_term, request.form.get("page", 1, type=int))
+    return render_template('pages/search_artists.html', results=response, search_term=search_term)
+
+
+def load_artist_schedule(artist_id):
+    # the artist, its genres and all of its shows in one round trip
+    genres = genre_names(artist_genres, artist_genres.c.artist_id, artist_id)
+    rows = Artist.query.with_entities(
+        Artist,
+        genres.c.genre_names,
+        Show.venue_id,
+        Venue.name.label("venue_name"),
+        Venue.image_link.label("venue_image_link"),
+        Show.start_time,
+    ).outerjoin(Artist.shows).outerjoin(Venue, Show.venue_id == Venue.id)\
+        .outerjoin(genres, genres.c.id == Artist.id)\
+        .options(db.lazyload(Artist.genre_rows))\
+        .filter(Artist.id == artist_id).all()
+    if(not rows):
+        return None
+    artist = rows[0].Artist
+    shows = [{
+        "venue_id": row.venue_id,
+        "venue_name": row.venue_name,
+        "venue_image_link": row.venue_image_link,
+        "start_time": row.start_time
+    } for row in rows if row.start_time is not None]
+    return ShowSchedule({
+        "id": artist.id,
+        "name": artist.name,
+        "genres": split_genre_names(rows[0].genre_names),
+        "city": artist.city,
+        "state": artist.state,
+        "phone": artist.phone,
+        "website": artist.website_link,
+        "facebook_link": artist.facebook_link,
+        "seeking_venue": artist.seeking_venue,
+        "seeking_description": artist.seeking_description,
+        "image_link": artist.image_link
+    }, shows, tags={f"venue:{show['venue_id']}" for show in shows})
+
+
+@blueprint.route('/artists/<int:artist_id>')
+@read_only
+@cached_page("artist:{artist_id}")
+def show_artist(artist_id):
+    data = {}
+    try:
+        data = schedule_detail("artist", artist_id, lambda: load_artist_schedule(artist_id))
+    except ValueError as e:
+        flash(f"An error occurred: {e}")
+        abort(404)
+    except:
+        flash("An error occurred")
+        abort(500)
+    return render_template('pages/show_artist.html', artist=data)
+
+#  Update
+#  ----------------------------------------------------------------
+
+
+@blueprint.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+    artist = Artist.query.get(artist_id)
+    if (artist is None):
+        flash(f"Artist does not exist: {artist_id}")
+        abort(404)
+    form = ArtistForm(obj=artist)
+    return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+
+@blueprint.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+    form = ArtistForm()
+    error = False
+    if form.validate_on_submit():
+        try:
+            artist = Artist.query.get(artist_id)
+            form.populate_obj(artist)
+            db.session.commit()
+            invalidate_pages("artists", f"artist:{artist_id}")
+        except:
+            error = True
+            db.session.rollback()
+        finally:
+            db.session.close()
+    else:
+        flash("Some fields are not valid")
+        return redirect(url_for("artists.edit_artist", artist_id=artist_id))
+    if error:
+        flash(f"Could not edit artist: {artist_id}")
+        abort(500)
+    flash(f"Successfully edited Artist: {form.name.data}")
+    return redirect(url_for('artists.show_artist', artist_id=artist_id))
+
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+
+@blueprint.route('/artists/create', methods=['GET'])
+def create_artist_form():
+    form = ArtistForm()
+    return render_template('forms/new_artist.html', form=form)
+
+
+@blueprint.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+    form = ArtistForm()
+    error = False
+    if form.validate_on_submit():
+        try:
+            artist = Artist(
+                name=form.name.data,
+                city=form.city.data,
+                state=form.state.data,
+                phone=form.phone.data,
+                genres=form.genres.data,
+                image_link=form.image_link.data,
+                facebook_link=form.facebook_link.data,
+                website_link=form.website_link.data,
+                seeking_venue=form.seeking_venue.data,
+                seeking_description=form.seeking_description.data,
+            )
+            db.session.add(artist)
+            db.session.commit()
+            invalidate_pages("artists")
+            flash('Artist ' + artist.name +
+                  ' was successfully listed!')
+        except:
+            error = True
+            db.session.rollback()
+        finally:
+            db.session.close()
+        if error:
+            abort(500)
+    else:
+        flash("Some fields failed validation")
+        return render_template('forms/new_artist.html', form=form)
+    return redirect(url_for("pages.index"))
+
+
+@blueprint.route('/artists/<int:artist_id>', methods=['DELETE'])
+def delete_artist(artist_id):
+    error = False
+    try:
+        artist = Artist.query.get(artist_id)
+        if(artist is None):
+            flash(f"Artist does not exist: {artist_id}")
+            abort(404)
+        db.session.delete(artist)
+        db.session.commit()
+        invalidate_pages("artists", f"artist:{artist_id}")
+        flash(f"Successfully delete artist: {artist_id}")
+    except:
+        error = True
+        db.session.rollback()
+    finally:
+        db.session.close()
+    if error:
+        flash(f"Could not delete artist: {artist_id}")
+        abort(500)
+    return jsonify({"done": True})
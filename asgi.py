@@ -0,0 +1,9 @@
+"""ASGI entry point: the async read API, with every other route served by
+the Flask app through a thread pool.
+
+    uvicorn asgi:app --workers 4
+"""
+from async_api import create_async_app
+from wsgi import app as wsgi_app
+
+app = create_async_app(wsgi_app=wsgi_app)
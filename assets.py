@@ -0,0 +1,232 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+from io import BytesIO
+
+from flask import current_app, request, send_from_directory, url_for
+
+#----------------------------------------------------------------------------#
+# Static assets.
+#----------------------------------------------------------------------------#
+
+# `flask build-assets` writes every bundle and file below to static/dist
+# under a content hash, with gzip and brotli copies, and lists them in
+# dist/manifest.json. Without a build the templates link the sources.
+
+BUNDLES = {
+    "css/app.css": ["css/bootstrap.min.css", "css/layout.main.css", "css/main.css",
+                    "css/main.responsive.css", "css/main.quickfix.css"],
+    # loaded in <head>, before the page renders
+    "js/head.js": ["js/libs/modernizr-2.8.2.min.js", "js/libs/moment.min.js",
+                   "js/script.js"],
+    # loaded deferred, after jQuery
+    "js/app.js": ["js/libs/bootstrap-3.1.1.min.js", "js/plugins.js"],
+}
+
+FILES = ["js/show_artist.js", "js/show_venue.js", "js/libs/jquery-1.11.1.min.js",
+         "js/libs/respond-1.4.2.min.js"]
+
+# image -> widths of the responsive copies, each written as JPEG and WebP
+IMAGES = {"img/front-splash.jpg": [480, 960, 1440]}
+
+DIST = "dist"
+MANIFEST = "manifest.json"
+COMPRESSED_TYPES = (".css", ".js", ".svg", ".json")
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+
+def _fingerprint(name, content):
+    root, extension = posixpath.splitext(name)
+    return f"{DIST}/{root}.{hashlib.sha256(content).hexdigest()[:12]}{extension}"
+
+
+def _rebase_urls(css, source, target):
+    """Points the relative url()s of `source` at the same files from
+    `target`'s directory."""
+    def rebase(match):
+        quote, url = match.groups()
+        if url.startswith(("data:", "http:", "https:", "//", "/", "#")):
+            return match.group(0)
+        path = posixpath.normpath(posixpath.join(posixpath.dirname(source), url))
+        return f"url({quote}{posixpath.relpath(path, posixpath.dirname(target))}{quote})"
+    return CSS_URL.sub(rebase, css)
+
+
+def _minify(name, text):
+    import rcssmin
+    import rjsmin
+    if ".min." in name:
+        return text
+    if name.endswith(".css"):
+        return rcssmin.cssmin(text)
+    return rjsmin.jsmin(text)
+
+
+def _write(static_folder, path, content):
+    """Writes `content` with its precompressed copies; returns the bytes
+    written for the identity, gzip and brotli versions."""
+    full_path = os.path.join(static_folder, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, "wb") as file:
+        file.write(content)
+    sizes = [len(content)]
+    if path.endswith(COMPRESSED_TYPES):
+        compressed = gzip.compress(content, 9, mtime=0)
+        with open(full_path + ".gz", "wb") as file:
+            file.write(compressed)
+        sizes.append(len(compressed))
+        try:
+            import brotli
+        except ImportError:
+            return sizes
+        compressed = brotli.compress(content, quality=11)
+        with open(full_path + ".br", "wb") as file:
+            file.write(compressed)
+        sizes.append(len(compressed))
+    return sizes
+
+
+def build_bundle(static_folder, name, sources):
+    target = f"{DIST}/{name}"
+    parts = []
+    for source in sources:
+        with open(os.path.join(static_folder, source), encoding="utf-8") as file:
+            text = _minify(source, file.read())
+        if name.endswith(".css"):
+            text = _rebase_urls(text, source, target)
+        parts.append(text)
+    # ";" keeps one script's last statement from running into the next
+    content = ("\n" if name.endswith(".css") else "\n;").join(parts).encode()
+    return _fingerprint(name, content), content
+
+
+def build_image(static_folder, name, widths):
+    """JPEG and WebP copies of `name` at each of `widths` (no wider than
+    the original); returns {format: [(path, width), ...]} and the files."""
+    from PIL import Image
+    image = Image.open(os.path.join(static_folder, name)).convert("RGB")
+    root = posixpath.splitext(name)[0]
+    variants, files = {"jpeg": [], "webp": []}, {}
+    for width in sorted({min(width, image.width) for width in widths}):
+        resized = image.resize((width, round(image.height * width / image.width)),
+                               Image.LANCZOS)
+        for format, extension, options in (
+                ("jpeg", "jpg", {"quality": 80, "optimize": True, "progressive": True}),
+                ("webp", "webp", {"quality": 75, "method": 6})):
+            buffer = BytesIO()
+            resized.save(buffer, format.upper(), **options)
+            path = _fingerprint(f"{root}-{width}.{extension}", buffer.getvalue())
+            files[path] = buffer.getvalue()
+            variants[format].append((path, width))
+    return variants, files
+
+
+def build_assets(static_folder, echo=print):
+    """Builds the bundles, fingerprinted files and images into
+    static/dist and writes the manifest the templates read."""
+    manifest = {"files": {}, "bundles": {}, "images": {}}
+    outputs = {}
+    for name, sources in BUNDLES.items():
+        path, content = build_bundle(static_folder, name, sources)
+        outputs[path] = content
+        manifest["bundles"][name] = path
+    for name in FILES:
+        with open(os.path.join(static_folder, name), "rb") as file:
+            content = file.read()
+        path = _fingerprint(name, content)
+        outputs[path] = content
+        manifest["files"][name] = path
+    for name, widths in IMAGES.items():
+        variants, files = build_image(static_folder, name, widths)
+        outputs.update(files)
+        manifest["images"][name] = variants
+    for path, content in outputs.items():
+        sizes = _write(static_folder, path, content)
+        echo(f"{path}: " + " / ".join(f"{size // 1024} KiB" for size in sizes))
+    with open(os.path.join(static_folder, DIST, MANIFEST), "w") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    return manifest
+
+#----------------------------------------------------------------------------#
+# Runtime.
+#----------------------------------------------------------------------------#
+
+
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, DIST, MANIFEST)) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def _manifest():
+    return current_app.extensions.get("assets")
+
+
+def asset_urls(name):
+    """The URLs to include for a bundle: the built file, or its sources
+    when the assets are not built."""
+    manifest = _manifest()
+    if manifest and name in manifest["bundles"]:
+        return [url_for("static", filename=manifest["bundles"][name])]
+    return [url_for("static", filename=source) for source in BUNDLES[name]]
+
+
+def asset_url(name):
+    """The fingerprinted URL for a file; for an image, its widest JPEG
+    copy, for browsers without srcset."""
+    manifest = _manifest()
+    if manifest and name in manifest["files"]:
+        return url_for("static", filename=manifest["files"][name])
+    if manifest and name in manifest["images"]:
+        return url_for("static", filename=manifest["images"][name]["jpeg"][-1][0])
+    return url_for("static", filename=name)
+
+
+def image_srcset(name, format):
+    """A srcset over the responsive copies of `name` in `format` ("jpeg"
+    or "webp"), or "" when there are none."""
+    manifest = _manifest()
+    variants = manifest and manifest["images"].get(name, {}).get(format)
+    if not variants:
+        return ""
+    return ", ".join(f"{url_for('static', filename=path)} {width}w"
+                     for path, width in variants)
+
+
+def send_static_file(filename):
+    """Flask's static view, plus precompressed copies for clients that
+    accept them and year-long immutable caching for fingerprinted files."""
+    static_folder = current_app.static_folder
+    if not filename.startswith(DIST + "/"):
+        return send_from_directory(static_folder, filename)
+    accepted = request.accept_encodings
+    mimetype = mimetypes.guess_type(filename)[0]
+    for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+        if accepted[encoding] and \
+                os.path.isfile(os.path.join(static_folder, filename + suffix)):
+            response = send_from_directory(static_folder, filename + suffix,
+                                           mimetype=mimetype,
+                                           download_name=posixpath.basename(filename))
+            response.headers["Content-Encoding"] = encoding
+            break
+    else:
+        response = send_from_directory(static_folder, filename)
+    if filename.endswith(COMPRESSED_TYPES):
+        response.vary.add("Accept-Encoding")
+    response.headers["Cache-Control"] = IMMUTABLE
+    return response
+
+
+def init_assets(app):
+    app.extensions["assets"] = load_manifest(app.static_folder)
+    app.view_functions["static"] = send_static_file
+    app.jinja_env.globals.update(asset_urls=asset_urls, asset_url=asset_url,
+                                 image_srcset=image_srcset)
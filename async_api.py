@@ -0,0 +1,273 @@
+import asyncio
+import hashlib
+import json
+import os
+from datetime import datetime
+from itertools import groupby
+
+from flask import Config
+from sqlalchemy import func, select, true, tuple_
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.applications import Starlette
+from starlette.middleware.wsgi import WSGIMiddleware
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+
+from models import artist_genres, venue_genres, Artist, Genre, Show, Venue
+from pagination import decode_cursor, encode_cursor
+from pool import configure_engine, engine_options
+from search import PostgresSearch
+
+#----------------------------------------------------------------------------#
+# Async read API.
+#----------------------------------------------------------------------------#
+
+# Mirrors the /api/v1 reads of the api blueprint on SQLAlchemy's asyncio
+# engine, so one process keeps hundreds of clients' queries in flight
+# instead of one per worker thread.
+
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+DETAILS = {
+    "venue": (Venue, venue_genres, Show.venue_id, Artist, Show.artist_id, [
+        "address", "city", "state", "phone", "website_link", "facebook_link",
+        "seeking_talent", "seeking_description", "image_link"]),
+    "artist": (Artist, artist_genres, Show.artist_id, Venue, Show.venue_id, [
+        "city", "state", "phone", "website_link", "facebook_link",
+        "seeking_venue", "seeking_description", "image_link"]),
+}
+
+
+def async_url(url):
+    url = make_url(url)
+    return url.set(drivername=f"{url.get_backend_name()}+"
+                   f"{ASYNC_DRIVERS[url.get_backend_name()]}")
+
+
+def create_async_engine_from(config):
+    url = async_url(config["SQLALCHEMY_DATABASE_URI"])
+    options = engine_options(dict(config, SQLALCHEMY_DATABASE_URI=str(url)))
+    # asyncio engines bring their own adapted queue pool
+    options.pop("poolclass", None)
+    if url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:"):
+        # aiosqlite defaults to a new connection and thread per checkout
+        options.update(poolclass=AsyncAdaptedQueuePool,
+                       pool_size=config["DB_POOL_SIZE"],
+                       max_overflow=config["DB_MAX_OVERFLOW"])
+    engine = create_async_engine(url, **options)
+    configure_engine(engine.sync_engine, config)
+    return engine
+
+
+def json_response(request, data, status_code=200):
+    """JSON with a strong ETag over the body; a matching If-None-Match gets
+    an empty 304, as from the `conditional` decorator."""
+    body = json.dumps(data, default=lambda value: value.isoformat()).encode()
+    if status_code != 200:
+        return Response(body, status_code, media_type="application/json")
+    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(body, headers={"ETag": etag}, media_type="application/json")
+
+
+def error(request, status_code, message):
+    return json_response(request, {"error": message}, status_code)
+
+
+async def fetch(engine, statement):
+    # one connection per statement, so gathered statements run concurrently
+    async with engine.connect() as connection:
+        return (await connection.execute(statement)).all()
+
+
+def _page_size(request):
+    config = request.app.state.config
+    try:
+        page_size = int(request.query_params.get("page_size", config["PAGE_SIZE"]))
+    except ValueError:
+        page_size = config["PAGE_SIZE"]
+    return min(max(page_size, 1), config["MAX_PAGE_SIZE"])
+
+
+async def keyset_page(request, statement, keys):
+    """The async counterpart of `keyset_paginate`; raises ValueError for a
+    malformed cursor."""
+    page_size = _page_size(request)
+    after = request.query_params.get("after")
+    before = request.query_params.get("before")
+    position = tuple_(*keys)
+    if before:
+        rows = await fetch(request.app.state.engine, statement
+                           .where(position < decode_cursor(before, keys))
+                           .order_by(*[key.desc() for key in keys])
+                           .limit(page_size + 1))
+        has_prev, has_next = len(rows) > page_size, True
+        rows = rows[:page_size][::-1]
+    else:
+        if after:
+            statement = statement.where(position > decode_cursor(after, keys))
+        rows = await fetch(request.app.state.engine,
+                           statement.order_by(*keys).limit(page_size + 1))
+        has_prev, has_next = bool(after), len(rows) > page_size
+        rows = rows[:page_size]
+    return {
+        "data": [row._asdict() for row in rows],
+        "page_size": page_size,
+        "prev_cursor": encode_cursor(rows[0], keys) if rows and has_prev else None,
+        "next_cursor": encode_cursor(rows[-1], keys) if rows and has_next else None
+    }
+
+#----------------------------------------------------------------------------#
+# Endpoints.
+#----------------------------------------------------------------------------#
+
+
+async def venues(request):
+    rows = await fetch(request.app.state.engine, select(
+        Venue.id, Venue.name, Venue.city, Venue.state, Venue.num_upcoming_shows)
+        .order_by(Venue.state, Venue.city, Venue.id))
+    return json_response(request, {"areas": [{
+        "city": city,
+        "state": state,
+        "venues": [{
+            "id": venue.id,
+            "name": venue.name,
+            "num_upcoming_shows": venue.num_upcoming_shows
+        } for venue in venues]
+    } for (city, state), venues in groupby(rows, key=lambda venue: (venue.city, venue.state))]})
+
+
+async def detail(request, kind, id):
+    """Entity, genres, past and upcoming shows as four concurrent queries."""
+    model, genres, own_id, other, other_id, fields = DETAILS[kind]
+    now = datetime.now()
+    shows = select(
+        other_id, other.name.label(f"{other.__name__.lower()}_name"),
+        other.image_link.label(f"{other.__name__.lower()}_image_link"),
+        Show.start_time).join(other, other.id == other_id)\
+        .where(own_id == id).order_by(Show.start_time)
+    engine = request.app.state.engine
+    entity, genre_rows, past_shows, upcoming_shows = await asyncio.gather(
+        fetch(engine, select(model.id, model.name,
+                             *[getattr(model, field) for field in fields])
+              .where(model.id == id)),
+        fetch(engine, select(Genre.name).join(genres)
+              .where(genres.c[f"{kind}_id"] == id).order_by(Genre.name)),
+        fetch(engine, shows.where(Show.start_time < now)),
+        fetch(engine, shows.where(Show.start_time >= now)))
+    if not entity:
+        return error(request, 404, f"{kind}_id does not exist")
+    entity = entity[0]
+    data = {"id": entity.id, "name": entity.name,
+            "genres": [row.name for row in genre_rows]}
+    for field in fields:
+        # named as in the sync API's schedule details
+        data["website" if field == "website_link" else field] = entity._mapping[field]
+    data["past_shows"] = [row._asdict() for row in past_shows]
+    data["upcoming_shows"] = [row._asdict() for row in upcoming_shows]
+    data["past_shows_count"] = len(past_shows)
+    data["upcoming_shows_count"] = len(upcoming_shows)
+    return json_response(request, data)
+
+
+async def show_venue(request):
+    return await detail(request, "venue", request.path_params["venue_id"])
+
+
+async def show_artist(request):
+    return await detail(request, "artist", request.path_params["artist_id"])
+
+
+async def artists(request):
+    try:
+        return json_response(request, await keyset_page(
+            request, select(Artist.id, Artist.name), [Artist.id]))
+    except ValueError as e:
+        return error(request, 400, str(e))
+
+
+async def shows(request):
+    try:
+        return json_response(request, await keyset_page(request, select(
+            Show.id,
+            Show.venue_id,
+            Venue.name.label("venue_name"),
+            Show.artist_id,
+            Artist.name.label("artist_name"),
+            Artist.image_link.label("artist_image_link"),
+            Show.start_time
+        ).join(Artist).join(Venue), [Show.start_time, Show.id]))
+    except ValueError as e:
+        return error(request, 400, str(e))
+
+
+def match(engine, model, term):
+    """`search_entities`' filter and ranking in SQL; without PostgreSQL the
+    in-memory index is not available here, so names are substring matched."""
+    if "," in term:
+        city, state = [string.strip() for string in term.split(",", 1)]
+        return (func.lower(model.city) == city.lower()) & \
+            (func.lower(model.state) == state.lower()), [model.id]
+    if engine.dialect.name == "postgresql":
+        backend = PostgresSearch()
+        return backend.match(model, term), backend.ranking(model, term)
+    return (model.name.ilike(f"%{term}%") if term.strip() else true()), [model.id]
+
+
+async def search(request, model):
+    term = request.query_params.get("search_term", "")
+    try:
+        page = max(int(request.query_params.get("page", 1)), 1)
+    except ValueError:
+        page = 1
+    per_page = request.app.state.config["SEARCH_PAGE_SIZE"]
+    engine = request.app.state.engine
+    condition, ranking = match(engine, model, term)
+    # the total and the page are independent, so run them side by side
+    total, rows = await asyncio.gather(
+        fetch(engine, select(func.count()).select_from(model).where(condition)),
+        fetch(engine, select(model.id, model.name, model.num_upcoming_shows)
+              .where(condition).order_by(*ranking)
+              .offset((page - 1) * per_page).limit(per_page)))
+    total = total[0][0]
+    return json_response(request, {
+        "count": total,
+        "data": [row._asdict() for row in rows],
+        "page": page,
+        "has_prev": page > 1,
+        "has_next": page * per_page < total
+    })
+
+
+async def search_venues(request):
+    return await search(request, Venue)
+
+
+async def search_artists(request):
+    return await search(request, Artist)
+
+
+def create_async_app(config="config", wsgi_app=None):
+    """The async read API as an ASGI app. Everything else, writes included,
+    is passed to `wsgi_app` (the Flask app) when one is given."""
+    settings = Config(os.path.dirname(__file__))
+    settings.from_object(config)
+    engine = create_async_engine_from(settings)
+    routes = [
+        Route("/api/v1/venues", venues),
+        Route("/api/v1/venues/search", search_venues),
+        Route("/api/v1/venues/{venue_id:int}", show_venue),
+        Route("/api/v1/artists", artists),
+        Route("/api/v1/artists/search", search_artists),
+        Route("/api/v1/artists/{artist_id:int}", show_artist),
+        Route("/api/v1/shows", shows),
+    ]
+    if wsgi_app is not None:
+        routes.append(Mount("/", WSGIMiddleware(wsgi_app)))
+    app = Starlette(routes=routes, on_shutdown=[engine.dispose])
+    app.state.engine = engine
+    app.state.config = settings
+    return app
@@ -0,0 +1,102 @@
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time, timedelta
+from itertools import groupby
+
+from flask import current_app
+from models import db, artist_genres, venue_genres, Artist, Genre, Show, Venue
+from pagination import Page, decode_cursor, encode_cursor, page_size_from
+from scheduling import booking_window
+
+#----------------------------------------------------------------------------#
+# Availability.
+#----------------------------------------------------------------------------#
+
+# model, its Show column, and its genre association table and column
+ENTITIES = {
+    "venues": (Venue, Show.venue_id, venue_genres, venue_genres.c.venue_id),
+    "artists": (Artist, Show.artist_id, artist_genres, artist_genres.c.artist_id),
+}
+
+
+def date_range(args):
+    """The `start` and `end` dates (YYYY-MM-DD, both included) in `args`;
+    `end` defaults to `start`."""
+    try:
+        start = date.fromisoformat(args.get("start", ""))
+        end = date.fromisoformat(args.get("end") or start.isoformat())
+    except ValueError:
+        raise ValueError("start and end must be dates as YYYY-MM-DD")
+    days = (end - start).days + 1
+    max_days = current_app.config["AVAILABILITY_MAX_DAYS"]
+    if not 1 <= days <= max_days:
+        raise ValueError(f"the range must be 1 to {max_days} days, start to end")
+    return start, end
+
+
+def slots(start, end):
+    """Every AVAILABILITY_SLOT_TIMES start time on each day from `start` to
+    `end`, in order."""
+    times = [time.fromisoformat(slot) for slot in
+             current_app.config["AVAILABILITY_SLOT_TIMES"]]
+    return [datetime.combine(start + timedelta(days=day), slot_time)
+            for day in range((end - start).days + 1) for slot_time in times]
+
+
+def availability_page(kind, args):
+    """A keyset page of venues or artists in `args`' city, state and genre,
+    each with the slots from `start` to `end` they could still be booked
+    for; ones with no free slot are left out.
+
+    A free slot, an ISO datetime string, is one `scheduling` would accept a
+    show at: no show of theirs starts within the booking window of it. The
+    page and its shows come from one statement: the page of ids as a
+    subquery, outer joined to a range scan of the (id, start_time) index
+    for each.
+    """
+    model, show_column, genre_table, genre_column = ENTITIES[kind]
+    start, end = date_range(args)
+    candidates = slots(start, end)
+    window = booking_window()
+    page_size = page_size_from(args)
+
+    query = model.query.with_entities(model.id, model.name, model.city, model.state)
+    if args.get("city"):
+        query = query.filter(db.func.lower(model.city) == args["city"].strip().lower())
+    if args.get("state"):
+        query = query.filter(db.func.lower(model.state) == args["state"].strip().lower())
+    if args.get("genre"):
+        query = query.join(genre_table, genre_column == model.id)\
+            .join(Genre, Genre.id == genre_table.c.genre_id)\
+            .filter(Genre.name == args["genre"])
+    after = args.get("after")
+    if after:
+        query = query.filter(model.id > decode_cursor(after, [model.id])[0])
+    page = query.order_by(model.id).limit(page_size + 1).subquery()
+    rows = db.session.query(page, Show.start_time).outerjoin(Show, db.and_(
+        show_column == page.c.id,
+        Show.start_time > candidates[0] - window,
+        Show.start_time < candidates[-1] + window,
+    )).order_by(page.c.id, Show.start_time).all()
+
+    # the shows mark the slots they block, which is cheaper than testing
+    # every slot since most of a month is free; each slot is formatted once
+    labels = [slot.isoformat() for slot in candidates]
+    entities = [list(group) for _, group in groupby(rows, key=lambda row: row.id)]
+    has_next = len(entities) > page_size
+    entities = entities[:page_size]
+    data = []
+    for group in entities:
+        blocked = set()
+        for row in group:
+            if row.start_time is not None:
+                blocked.update(range(bisect_right(candidates, row.start_time - window),
+                                     bisect_left(candidates, row.start_time + window)))
+        if len(blocked) < len(candidates):
+            first = group[0]
+            data.append({"id": first.id, "name": first.name, "city": first.city,
+                         "state": first.state,
+                         "free": [label for index, label in enumerate(labels)
+                                  if index not in blocked]})
+    return Page(
+        data, page_size, None,
+        encode_cursor(entities[-1][0], [model.id]) if has_next else None)
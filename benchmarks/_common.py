@@ -0,0 +1,33 @@
+"""Builds the app the way every in-process benchmark needs it."""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def create_benchmark_app(scratch_name=None, **environ):
+    """Returns the app and whether it runs on a new scratch database.
+
+    The page cache, debug mode and the slow request log are off, so that
+    every request renders and nothing is logged; `environ` overrides them.
+    Without DATABASE_URL and given a `scratch_name`, the app runs on a new
+    sqlite database of that name with its tables created, for the caller
+    to seed.
+    """
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ.update({"PAGE_CACHE": "none", "DEBUG": "false",
+                       "SLOW_REQUEST_MS": "0", **environ})
+    directory = tempfile.mkdtemp()
+    scratch = scratch_name is not None and "DATABASE_URL" not in os.environ
+    if scratch:
+        os.environ["DATABASE_URL"] = f"sqlite:///{directory}/{scratch_name}"
+    # the app logs to error.log in the working directory outside debug
+    os.chdir(directory)
+    from initialise_app import create_app
+    from models import db
+    app = create_app()
+    if scratch:
+        with app.app_context():
+            db.create_all()
+    return app, scratch
@@ -0,0 +1,126 @@
+"""Compares the sync API under gunicorn with the async read API under
+uvicorn at a few hundred simultaneous clients.
+
+Both servers get the same number of worker processes and the database in
+DATABASE_URL (seed it first); the page cache is off so every request
+reaches the database. E.g.:
+    DATABASE_URL=postgresql://localhost/fyyur python benchmarks/async_benchmark.py \\
+        --clients 500 --workers 4 --duration 20
+"""
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+PATHS = ["/api/v1/venues/1", "/api/v1/artists/1", "/api/v1/venues/2",
+         "/api/v1/artists/2", "/api/v1/shows", "/api/v1/venues/search?search_term=a"]
+
+SERVERS = {
+    "sync": ["-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+    "async": ["-m", "uvicorn", "asgi:app", "--no-access-log", "--log-level", "warning"],
+}
+
+
+async def request(connection, port, path):
+    reader, writer = connection
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\n\r\n".encode())
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length, keep_alive = 0, True
+    while True:
+        line = (await reader.readline()).strip()
+        if not line:
+            break
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+        elif name.lower() == "connection" and value.strip().lower() == "close":
+            keep_alive = False
+    await reader.readexactly(length)
+    return status, keep_alive
+
+
+async def client(port, number, deadline, latencies, errors):
+    connection = None
+    while time.perf_counter() < deadline:
+        path = PATHS[number % len(PATHS)]
+        number += 1
+        started = time.perf_counter()
+        try:
+            if connection is None:
+                connection = await asyncio.open_connection("127.0.0.1", port)
+            status, keep_alive = await request(connection, port, path)
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+            errors.append(path)
+            connection = None
+            await asyncio.sleep(0.01)
+            continue
+        latencies.append(time.perf_counter() - started)
+        if status >= 500:
+            errors.append(path)
+        if not keep_alive:
+            connection[1].close()
+            connection = None
+
+
+async def drive(port, clients, duration):
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*[client(port, number, deadline, latencies, errors)
+                           for number in range(clients)])
+    return sorted(latencies), errors
+
+
+def wait_until_up(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            asyncio.run(asyncio.wait_for(
+                asyncio.open_connection("127.0.0.1", port), 1))
+            return
+        except (OSError, asyncio.TimeoutError):
+            time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+def run(kind, options):
+    env = dict(os.environ, WEB_CONCURRENCY=str(options.workers),
+               BIND=f"127.0.0.1:{options.port}", PAGE_CACHE="none",
+               GUNICORN_THREADS=str(options.threads))
+    env.setdefault("SECRET_KEY", "benchmark")
+    arguments = SERVERS[kind]
+    if kind == "async":
+        arguments = arguments + ["--port", str(options.port),
+                                 "--workers", str(options.workers)]
+    server = subprocess.Popen([sys.executable] + arguments, cwd=ROOT, env=env,
+                              stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up(options.port)
+        latencies, errors = asyncio.run(
+            drive(options.port, options.clients, options.duration))
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+    percentile = lambda p: latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000 \
+        if latencies else float("nan")
+    print(f"{kind:>5}: {len(latencies) / options.duration:8.1f} req/s, "
+          f"p50 {percentile(0.5):7.1f} ms, p99 {percentile(0.99):7.1f} ms, "
+          f"{len(errors)} errors")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--threads", type=int, default=4,
+                        help="threads per gunicorn worker for the sync run")
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--port", type=int, default=8766)
+    options = parser.parse_args()
+    print(f"{options.clients} clients, {options.workers} workers")
+    for kind in ("sync", "async"):
+        run(kind, options)
@@ -0,0 +1,85 @@
+"""Times the availability API over a month for every venue, page by page,
+and for the narrower city, state and genre searches; fails if a request
+issues more than one statement.
+
+Without DATABASE_URL it seeds a scratch sqlite database with --venues
+venues first; with it, seed that database beforehand
+(`flask seed-data ...`). E.g.:
+    python benchmarks/availability_benchmark.py
+    DATABASE_URL=postgresql://localhost/fyyur_bench python benchmarks/availability_benchmark.py
+"""
+import argparse
+import sys
+import time
+from datetime import date, timedelta
+
+from _common import create_benchmark_app
+
+
+def setup(options):
+    import seed
+    app, scratch = create_benchmark_app("availability.db")
+    if scratch:
+        with app.app_context():
+            seed.generate(options.venues, options.artists, options.shows,
+                          echo=lambda line: print(line, file=sys.stderr))
+    return app
+
+
+def walk(client, engine, url, page_size):
+    """Requests every page of `url`; returns the per-request seconds and
+    the venues returned."""
+    from profiling import assert_max_queries
+    timings, venues, cursor = [], 0, None
+    while True:
+        page_url = f"{url}&page_size={page_size}" + (f"&after={cursor}" if cursor else "")
+        with assert_max_queries(engine, 1):
+            started = time.perf_counter()
+            response = client.get(page_url)
+            timings.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            raise SystemExit(f"{page_url}: {response.status_code} {response.get_data(as_text=True)}")
+        venues += len(response.json["data"])
+        cursor = response.json["next_cursor"]
+        if cursor is None:
+            return timings, venues
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--venues", type=int, default=10000)
+    parser.add_argument("--artists", type=int, default=20000)
+    parser.add_argument("--shows", type=int, default=500000,
+                        help="spread from a year back to a year ahead")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--page-size", type=int, default=200)
+    options = parser.parse_args()
+
+    app = setup(options)
+    from models import db
+    start = date.today() + timedelta(days=1)
+    end = start + timedelta(days=options.days - 1)
+    # the next Saturday
+    saturday = start + timedelta(days=(5 - start.weekday()) % 7)
+    searches = [
+        ("every venue, month", f"start={start}&end={end}"),
+        ("New York, NY, month", f"start={start}&end={end}&city=New York&state=NY"),
+        ("Austin, TX, Jazz, month", f"start={start}&end={end}&city=Austin&state=TX&genre=Jazz"),
+        ("Austin, TX, Saturday", f"start={saturday}&city=Austin&state=TX"),
+    ]
+    with app.app_context():
+        client = app.test_client()
+        engine = db.engine
+        # warm up the connection pool and the compiled statement cache
+        walk(client, engine, f"/api/v1/venues/availability?{searches[0][1]}",
+             options.page_size)
+        for name, query in searches:
+            timings, venues = walk(client, engine,
+                                   f"/api/v1/venues/availability?{query}",
+                                   options.page_size)
+            timings.sort()
+            print(f"{name:26} {venues:6} venues free in {len(timings):3} requests, "
+                  f"total {sum(timings) * 1000:8.1f} ms, "
+                  f"p50 {timings[len(timings) // 2] * 1000:6.1f} ms, "
+                  f"max {timings[-1] * 1000:6.1f} ms")
+    print("ok: one statement per request")
@@ -0,0 +1,49 @@
+"""Times the `datetime` Jinja filter against the one it replaced, which
+re-parsed every value with dateutil and resolved the Babel pattern and
+locale on each call.
+
+    python benchmarks/datetime_filter_benchmark.py 10000
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+from _common import create_benchmark_app
+from formatting import format_datetime
+
+REPEAT = 5
+
+
+def legacy_format_datetime(value, format='medium'):
+    date = dateutil.parser.parse(str(value))
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en')
+
+
+def timed(filter, values, format):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        for value in values:
+            filter(value, format)
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    start = datetime(2030, 1, 1, 20)
+    values = [start + timedelta(hours=i) for i in range(count)]
+    app, _ = create_benchmark_app()
+    with app.test_request_context():
+        for format in ("medium", "full"):
+            assert all(format_datetime(value, format) == legacy_format_datetime(value, format)
+                       for value in values[:100])
+            legacy = timed(legacy_format_datetime, values, format)
+            fast = timed(format_datetime, values, format)
+            print(f"{format:>6}, {count} shows: {legacy:8.1f} ms before, "
+                  f"{fast:8.1f} ms after ({legacy / fast:.1f}x)")
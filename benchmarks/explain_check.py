@@ -0,0 +1,117 @@
+"""Fails if the app.py read queries fall back to sequential scans.
+
+Seeds a PostgreSQL database (migrated with `flask db upgrade`), replays the
+indexed routes through the test client, and EXPLAINs every statement they
+issue. Run against a scratch database only, e.g.:
+    DATABASE_URL=postgresql://localhost/fyyur_explain python benchmarks/explain_check.py
+
+/venues groups every venue by area, reading the whole table on purpose,
+and /shows/search ORs predicates across a join, so they are not checked.
+/artists and /shows are keyset pages, checked first, after and before a
+cursor in the middle of the table.
+"""
+import re
+import sys
+from datetime import datetime, timedelta
+from urllib.parse import quote
+
+from _common import create_benchmark_app
+from models import db
+from profiling import QueryCounter
+
+VENUES = 5000
+ARTISTS = 5000
+SHOWS = 100000
+
+# route -> tables that must be reached through an index
+# a (start_time, id) cursor in the middle of the seeded shows
+SHOW_CURSOR = quote(f"{datetime.now().isoformat()},{SHOWS // 2}")
+
+CHECKS = [
+    ("get", "/", None, ["Venue", "Artist"]),
+    ("get", "/artists", None, ["Artist"]),
+    ("get", f"/artists?after={ARTISTS // 2}", None, ["Artist"]),
+    ("get", f"/artists?before={ARTISTS // 2}", None, ["Artist"]),
+    ("get", "/shows", None, ["Show"]),
+    ("get", f"/shows?after={SHOW_CURSOR}", None, ["Show"]),
+    ("get", f"/shows?before={SHOW_CURSOR}", None, ["Show"]),
+    ("get", "/venues/42", None, ["Venue", "Show"]),
+    ("get", "/artists/42", None, ["Artist", "Show"]),
+    ("post", "/venues/search", {"search_term": "Venue 4242"}, ["Venue", "Show"]),
+    ("post", "/venues/search", {"search_term": "City 42, TX"}, ["Venue", "Show"]),
+    ("post", "/artists/search", {"search_term": "Artist 4242"}, ["Artist", "Show"]),
+    ("post", "/artists/search", {"search_term": "City 42, TX"}, ["Artist", "Show"]),
+    ("get", "/genres/Jazz", None, ["VenueGenre", "ArtistGenre", "Venue", "Artist"]),
+    ("get", f"/api/v1/venues/availability?start={datetime.now().date()}"
+            f"&end={datetime.now().date() + timedelta(days=29)}&city=City 42&state=TX",
+     None, ["Venue", "Show"]),
+    ("get", f"/api/v1/artists/availability?start={datetime.now().date()}"
+            f"&end={datetime.now().date() + timedelta(days=29)}&city=City 42&state=TX",
+     None, ["Artist", "Show"]),
+]
+
+SEQ_SCAN = re.compile(r'Seq Scan on "?(\w+)"?')
+
+
+def seed():
+    now = datetime.now()
+    db.session.execute(db.text(
+        'TRUNCATE "Show", "VenueGenre", "ArtistGenre", "Venue", "Artist" '
+        'RESTART IDENTITY CASCADE'))
+    db.session.execute(db.text(
+        'INSERT INTO "Venue" (name, city, state, address, seeking_talent) '
+        "VALUES (:name, :city, 'TX', '1 Main St', false)"),
+        [{"name": f"Venue {i}", "city": f"City {i % 1000}"} for i in range(VENUES)])
+    db.session.execute(db.text(
+        'INSERT INTO "Artist" (name, city, state, seeking_venue) '
+        "VALUES (:name, :city, 'TX', false)"),
+        [{"name": f"Artist {i}", "city": f"City {i % 1000}"} for i in range(ARTISTS)])
+    genres = db.session.execute(db.text('SELECT id FROM "Genre"')).scalars().all()
+    for table, column, rows in (("VenueGenre", "venue_id", VENUES),
+                                ("ArtistGenre", "artist_id", ARTISTS)):
+        db.session.execute(db.text(
+            f'INSERT INTO "{table}" ({column}, genre_id) VALUES (:id, :genre_id)'),
+            [{"id": i + 1, "genre_id": genres[i % len(genres)]} for i in range(rows)])
+    db.session.execute(db.text(
+        'INSERT INTO "Show" (venue_id, artist_id, start_time) '
+        "VALUES (:venue_id, :artist_id, :start_time)"),
+        [{"venue_id": i % VENUES + 1,
+          "artist_id": (i * 7) % ARTISTS + 1,
+          "start_time": now + timedelta(hours=i - SHOWS // 2)} for i in range(SHOWS)])
+    db.session.commit()
+    db.session.execute(db.text("ANALYZE"))
+    db.session.commit()
+
+
+def seq_scans(statement, parameters):
+    with db.engine.connect() as connection:
+        plan = connection.exec_driver_sql(
+            "EXPLAIN " + statement, parameters).scalars().all()
+    return set(SEQ_SCAN.findall("\n".join(plan)))
+
+
+if __name__ == "__main__":
+    app, _ = create_benchmark_app()
+    app.config["WTF_CSRF_ENABLED"] = False
+    failures = []
+    with app.app_context():
+        seed()
+        client = app.test_client()
+        for method, url, data, tables in CHECKS:
+            with QueryCounter(db.engine) as counter:
+                response = getattr(client, method)(url, data=data)
+                # streamed listings only query as their body is read
+                response.get_data()
+                response.close()
+            if response.status_code >= 400:
+                failures.append(f"{method.upper()} {url}: {response.status_code}")
+            for statement, parameters in counter.queries:
+                scanned = seq_scans(statement, parameters) & set(tables)
+                if scanned:
+                    failures.append(
+                        f"{method.upper()} {url} {data or ''}: seq scan on "
+                        f"{', '.join(sorted(scanned))}\n  {statement}")
+    if failures:
+        print("\n".join(failures))
+        sys.exit(1)
+    print("ok")
@@ -0,0 +1,102 @@
+"""Measures throughput of the production server as gunicorn workers are
+added, to check it scales with the cores available.
+
+Starts `gunicorn -c gunicorn.conf.py wsgi:app` once per worker count
+against the database in DATABASE_URL (seed it first), then drives it from
+as many client processes as requested for a fixed time, e.g.:
+    DATABASE_URL=postgresql://localhost/fyyur python benchmarks/load_test.py \\
+        --workers 1,2,4 --clients 8 --duration 10
+"""
+import argparse
+import http.client
+import os
+import signal
+import subprocess
+import sys
+import time
+from multiprocessing import Pool
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+PATHS = ["/", "/venues", "/artists", "/shows", "/venues/1", "/artists/1",
+         "/api/v1/venues", "/api/v1/shows"]
+
+
+def drive(args):
+    port, paths, duration = args
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+    number = 0
+    while time.perf_counter() < deadline:
+        path = paths[number % len(paths)]
+        number += 1
+        started = time.perf_counter()
+        try:
+            connection.request("GET", path)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 500:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+            connection = http.client.HTTPConnection("127.0.0.1", port)
+            continue
+        latencies.append(time.perf_counter() - started)
+    return latencies, errors
+
+
+def wait_until_up(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/cache/stats")
+            connection.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("gunicorn did not start")
+
+
+def run(workers, threads, clients, duration, port, page_cache):
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers),
+               GUNICORN_THREADS=str(threads), BIND=f"127.0.0.1:{port}",
+               PAGE_CACHE=page_cache)
+    env.setdefault("SECRET_KEY", "load-test")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+        cwd=ROOT, env=env, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up(port)
+        with Pool(clients) as pool:
+            results = pool.map(drive, [(port, PATHS, duration)] * clients)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+    latencies = sorted(latency for result in results for latency in result[0])
+    errors = sum(result[1] for result in results)
+    percentile = lambda p: latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000
+    return len(latencies) / duration, percentile(0.5), percentile(0.99), errors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", default=f"1,{os.cpu_count()}")
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--page-cache", default="none",
+                        help="PAGE_CACHE for the server; \"none\" measures rendering")
+    options = parser.parse_args()
+    print(f"{os.cpu_count()} cores, {options.clients} clients, "
+          f"{options.threads} threads per worker")
+    baseline = None
+    for workers in [int(count) for count in options.workers.split(",")]:
+        rate, p50, p99, errors = run(workers, options.threads, options.clients,
+                                     options.duration, options.port,
+                                     options.page_cache)
+        baseline = baseline or rate
+        print(f"{workers:3} workers: {rate:8.1f} req/s ({rate / baseline:.2f}x), "
+              f"p50 {p50:6.1f} ms, p99 {p99:6.1f} ms, {errors} errors")
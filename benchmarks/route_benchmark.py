@@ -0,0 +1,202 @@
+"""Measures p50/p99 latency and throughput of every read route in-process,
+and fails when a route got slower than the stored baseline.
+
+Without DATABASE_URL it seeds a scratch sqlite database at --scale first;
+with it, seed that database beforehand (`flask seed-data --scale ...`).
+The page cache is off so each request renders. E.g.:
+    python benchmarks/route_benchmark.py                    # check against baseline.json
+    python benchmarks/route_benchmark.py --update-baseline  # after an intended change
+
+Baselines only compare like with like: one recorded on another database,
+scale or machine has to be re-recorded there first.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+from datetime import date, timedelta
+
+from _common import create_benchmark_app
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# form data for the POST routes that only read
+SEARCH_FORMS = {
+    "venues.search_venues": {"search_term": "blue"},
+    "artists.search_artists": {"search_term": "blue"},
+    "shows.search_shows": {"search_term": "blue"},
+}
+QUERY_STRINGS = {
+    "api.api_search_venues": "?search_term=blue",
+    "api.api_search_artists": "?search_term=blue",
+    "api.api_search_shows": "?search_term=blue",
+    "api.api_venue_availability": f"?start={date.today()}&end={date.today() + timedelta(days=29)}",
+    "api.api_artist_availability": f"?start={date.today()}&end={date.today() + timedelta(days=29)}",
+}
+# served by the web server in production
+SKIPPED = {"static"}
+
+
+def routes(app, samples):
+    """(name, method, url, form) for every route that only reads; the
+    others are listed so a new route is never silently left out."""
+    measured, skipped = [], []
+    for rule in sorted(app.url_map.iter_rules(), key=lambda rule: rule.rule):
+        if rule.endpoint in SKIPPED:
+            continue
+        for method in sorted(rule.methods - {"HEAD", "OPTIONS"}):
+            if method == "POST" and rule.endpoint in SEARCH_FORMS:
+                form = SEARCH_FORMS[rule.endpoint]
+            elif method == "GET":
+                form = None
+            else:
+                skipped.append(f"{method} {rule.rule}")
+                continue
+            missing = rule.arguments - set(samples)
+            if missing:
+                raise SystemExit(f"no sample value for {', '.join(missing)} in {rule.rule}")
+            url = rule.build({name: samples[name] for name in rule.arguments})[1]
+            url += QUERY_STRINGS.get(rule.endpoint, "")
+            measured.append((f"{method} {rule.rule}", method, url, form))
+    return measured, skipped
+
+
+def request(client, method, url, form):
+    """Sends a request and reads the whole body, so streamed pages are
+    timed to their last byte and close their request context in order."""
+    response = getattr(client, method.lower())(url, data=form)
+    response.get_data()
+    response.close()
+    return response
+
+
+def measure(client, measured, requests, warmup, rounds):
+    """Times each route `requests` times, split over `rounds` passes over
+    all of them so drift in the machine's load hits every route alike."""
+    for name, method, url, form in measured:
+        for _ in range(warmup):
+            response = request(client, method, url, form)
+            if response.status_code >= 400:
+                raise SystemExit(f"{method} {url}: {response.status_code}")
+    # keep the app's long-lived objects out of the collector's full passes,
+    # whose pauses otherwise dominate the tail
+    gc.collect()
+    gc.freeze()
+    latencies = {name: [] for name, _, _, _ in measured}
+    elapsed = dict.fromkeys(latencies, 0.0)
+    for _ in range(rounds):
+        for name, method, url, form in measured:
+            round_started = time.perf_counter()
+            for _ in range(max(requests // rounds, 1)):
+                started = time.perf_counter()
+                request(client, method, url, form)
+                latencies[name].append(time.perf_counter() - started)
+            elapsed[name] += time.perf_counter() - round_started
+    results = {}
+    for name, samples in latencies.items():
+        samples.sort()
+        percentile = lambda p: samples[min(int(len(samples) * p), len(samples) - 1)] * 1000
+        results[name] = {"p50_ms": round(percentile(0.5), 3),
+                         "p99_ms": round(percentile(0.99), 3),
+                         "rps": round(len(samples) / elapsed[name], 1)}
+    return results
+
+
+def regressions(results, baseline, tolerance, p99_tolerance, min_ms):
+    """Routes whose p50 or p99 grew by more than its tolerance, a fraction,
+    ignoring differences under `min_ms`."""
+    found = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        for stat, allowed in (("p50_ms", tolerance), ("p99_ms", p99_tolerance)):
+            limit = before[stat] * (1 + allowed)
+            if result[stat] > limit and result[stat] - before[stat] >= min_ms:
+                found.append(f"{name}: {stat} {before[stat]} -> {result[stat]} "
+                             f"(limit {limit:.3f})")
+    return found
+
+
+def setup(options):
+    import seed
+    app, scratch = create_benchmark_app("benchmark.db")
+    if scratch:
+        with app.app_context():
+            seed.generate(*seed.SCALES[options.scale], seed=options.seed,
+                          echo=lambda line: print(line, file=sys.stderr))
+    return app
+
+
+def busiest(model, column):
+    """The id with the most shows, so the detail pages are measured at
+    their heaviest."""
+    from models import db, Show
+    return db.session.query(column).group_by(column)\
+        .order_by(db.func.count(Show.id).desc()).limit(1).scalar() or \
+        db.session.query(db.func.min(model.id)).scalar()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", default="small",
+                        help="seed.SCALES entry for the scratch database")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.3,
+                        help="allowed p50 growth, as a fraction")
+    parser.add_argument("--p99-tolerance", type=float, default=1.5,
+                        help="allowed p99 growth; the tail is noisy on shared machines")
+    parser.add_argument("--min-ms", type=float, default=1.0,
+                        help="ignore growth smaller than this")
+    options = parser.parse_args()
+    options.baseline = os.path.abspath(options.baseline)
+
+    app = setup(options)
+    from models import db, Artist, Genre, Show, Venue
+    with app.app_context():
+        samples = {
+            "venue_id": busiest(Venue, Show.venue_id),
+            "artist_id": busiest(Artist, Show.artist_id),
+            "genre": db.session.query(Genre.name).order_by(Genre.id).limit(1).scalar(),
+        }
+        environment = {
+            "database": db.engine.dialect.name,
+            "rows": [db.session.query(model).count() for model in (Venue, Artist, Show)],
+            "machine": f"{platform.machine()} {os.cpu_count()} cores",
+            "python": platform.python_version(),
+        }
+    measured, skipped = routes(app, samples)
+    client = app.test_client()
+    results = measure(client, measured, options.requests, options.warmup, options.rounds)
+    for name, result in results.items():
+        print(f"{name:40} p50 {result['p50_ms']:8.2f} ms  p99 {result['p99_ms']:8.2f} ms  "
+              f"{result['rps']:8.1f} req/s")
+    print(f"not measured (writes): {', '.join(skipped)}")
+
+    if options.update_baseline:
+        with open(options.baseline, "w") as file:
+            json.dump({"environment": environment, "routes": results}, file, indent=2)
+            file.write("\n")
+        print(f"wrote {options.baseline}")
+        sys.exit(0)
+    if not os.path.exists(options.baseline):
+        sys.exit(f"no baseline at {options.baseline}; record one with --update-baseline")
+    with open(options.baseline) as file:
+        baseline = json.load(file)
+    if baseline["environment"] != environment:
+        sys.exit(f"baseline was recorded on {baseline['environment']}, "
+                 f"this run is {environment}; re-record it with --update-baseline")
+    found = regressions(results, baseline["routes"], options.tolerance,
+                        options.p99_tolerance, options.min_ms)
+    if found:
+        print("regressions:\n  " + "\n  ".join(found))
+        sys.exit(1)
+    print("no regressions")
@@ -0,0 +1,53 @@
+"""Times a page of venue name search at scale against the unpaginated
+ilike('%term%') scan it replaced.
+
+Run against a scratch database (migrated on PostgreSQL), e.g.:
+    DATABASE_URL=sqlite:////tmp/fyyur.db python benchmarks/search_benchmark.py 100000
+"""
+import sys
+import time
+
+from _common import create_benchmark_app
+from models import db, Venue
+from search import get_search_backend
+
+WORDS = ["blue", "note", "roxy", "hall", "theatre", "club", "room", "garden",
+         "park", "house", "lounge", "cellar", "brewery", "arena", "stage"]
+TERMS = ["roxy", "blue no", "the", "cellar brew", "zzz"]
+REPEAT = 20
+
+
+def seed(rows):
+    db.session.execute(db.delete(Venue))
+    db.session.execute(db.insert(Venue), [{
+        "name": f"{WORDS[i % 15].title()} {WORDS[(i // 15) % 15].title()} {i}",
+        "city": "Austin", "state": "TX", "address": "1 Main St",
+        "seeking_talent": False} for i in range(rows)])
+    db.session.commit()
+
+
+def timed(function):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        function()
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    app, _ = create_benchmark_app()
+    with app.app_context():
+        # the migrations only run on PostgreSQL
+        if db.engine.dialect.name == "sqlite":
+            db.create_all()
+        seed(rows)
+        backend = get_search_backend()
+        # first call builds the in-memory index, if that backend is in use
+        backend.search(Venue, "warm", 1, 20)
+        print(f"{type(backend).__name__}, {rows} venues")
+        for term in TERMS:
+            indexed = timed(lambda: backend.search(Venue, term, 1, 20))
+            # what search_venues used to fetch and render: every match
+            scanned = timed(lambda: Venue.query.with_entities(Venue.id).filter(
+                Venue.name.ilike(f"%{term}%")).all())
+            print(f"{term!r:>14}: {indexed:8.2f} ms search, {scanned:8.2f} ms ilike")
@@ -0,0 +1,55 @@
+"""Measures how long importing the app takes, with `python -X importtime`,
+and lists the imports that cost the most.
+
+    DATABASE_URL=postgresql://localhost/fyyur python benchmarks/startup_time.py
+    python benchmarks/startup_time.py --module app --max-ms 600
+
+Each run is a fresh interpreter, so the numbers include everything a
+gunicorn master or a `flask` command pays before handling anything.
+`--max-ms` fails the run when the median exceeds it.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+
+def import_times(module):
+    """(self_us, cumulative_us, name) for every import, in import order."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True)
+    if result.returncode:
+        sys.exit(result.stderr.splitlines()[-1])
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times.append((int(self_us), int(cumulative_us), name.rstrip()))
+    return times
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="wsgi")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--max-ms", type=float)
+    options = parser.parse_args()
+    runs = [import_times(options.module) for _ in range(options.runs)]
+    totals = [next(cumulative for _, cumulative, name in times
+                   if name.strip() == options.module) / 1000 for times in runs]
+    median = statistics.median(totals)
+    print(f"import {options.module}: median {median:.0f} ms over {options.runs} runs "
+          f"(min {min(totals):.0f}, max {max(totals):.0f})")
+    # top-level modules and packages, each with everything it pulled in
+    top_level = [(cumulative, name.strip()) for _, cumulative, name in runs[-1]
+                 if "." not in name]
+    for cumulative, name in sorted(top_level, reverse=True)[:options.top]:
+        print(f"{cumulative / 1000:8.1f} ms  {name}")
+    if options.max_ms is not None and median > options.max_ms:
+        sys.exit(f"startup {median:.0f} ms is over the {options.max_ms:.0f} ms budget")
@@ -0,0 +1,37 @@
+"""Checks that /venues issues a constant number of SQL statements.
+
+Run against a scratch database, e.g.:
+    DATABASE_URL=sqlite:////tmp/fyyur.db python benchmarks/venues_query_count.py
+"""
+from _common import create_benchmark_app
+from models import db, Venue
+from profiling import QueryCounter, assert_max_queries
+
+
+def seed(areas):
+    for i in range(areas):
+        db.session.add(Venue(name=f"Venue {i}", city=f"City {i}", state="TX",
+                             address="1 Main St", seeking_talent=False))
+    db.session.commit()
+
+
+def reset(areas):
+    db.drop_all()
+    db.create_all()
+    seed(areas)
+
+
+if __name__ == "__main__":
+    app, _ = create_benchmark_app()
+    with app.app_context():
+        client = app.test_client()
+        reset(1)
+        with QueryCounter(db.engine) as counter:
+            client.get("/venues")
+        baseline = counter.count
+        for areas in (10, 100, 1000):
+            reset(areas)
+            with assert_max_queries(db.engine, baseline) as counter:
+                client.get("/venues")
+            print(f"{areas:>5} areas: {counter.count} queries")
+        print("ok")
@@ -0,0 +1,299 @@
+import csv
+import json
+import time
+from collections import Counter
+from datetime import datetime
+from itertools import islice
+
+from werkzeug.datastructures import MultiDict
+from cache import invalidate_pages
+from forms import ArtistForm, ShowForm, VenueForm
+from models import db, Genre, Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Bulk import and export.
+#----------------------------------------------------------------------------#
+
+BATCH_SIZE = 1000
+
+ENTITIES = {
+    "venues": (Venue, VenueForm, [
+        "id", "name", "city", "state", "address", "phone", "image_link",
+        "facebook_link", "website_link", "seeking_talent",
+        "seeking_description", "genres"]),
+    "artists": (Artist, ArtistForm, [
+        "id", "name", "city", "state", "phone", "image_link", "facebook_link",
+        "website_link", "seeking_venue", "seeking_description", "genres"]),
+    "shows": (Show, ShowForm, ["id", "venue_id", "artist_id", "start_time"]),
+}
+
+
+class ImportReport:
+
+    def __init__(self):
+        self.imported = 0
+        self.errors = []
+        self.started = time.perf_counter()
+
+    @property
+    def rows_per_second(self):
+        return self.imported / max(time.perf_counter() - self.started, 1e-9)
+
+
+def batched(rows, size=BATCH_SIZE):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def file_format(path, format=None):
+    format = format or path.rsplit(".", 1)[-1].lower()
+    if format in ("jsonl", "ndjson"):
+        return "jsonl"
+    if format == "csv":
+        return "csv"
+    raise ValueError(f"unknown file format: {format}")
+
+
+class MalformedRow:
+    """Stands in for a record that could not be parsed, so it is reported
+    under its row number rather than ending the import."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def read_rows(file, format):
+    """Yields one dict per record without reading the whole file; CSV genres
+    are a comma separated cell."""
+    if format == "csv":
+        for row in csv.DictReader(file):
+            if "genres" in row:
+                row["genres"] = [genre.strip() for genre in
+                                 (row["genres"] or "").split(",") if genre.strip()]
+            yield row
+    else:
+        for line in file:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError as error:
+                    yield MalformedRow(f"not valid JSON: {error}")
+
+
+def _formdata(row):
+    formdata = MultiDict()
+    for name, value in row.items():
+        if isinstance(value, list):
+            formdata.setlist(name, [str(item) for item in value])
+        elif isinstance(value, bool):
+            # BooleanField only treats "" and "false" as unchecked
+            formdata[name] = "y" if value else ""
+        elif value is None:
+            formdata[name] = ""
+        else:
+            formdata[name] = str(value)
+    return formdata
+
+
+def validate(form_class, fields, row):
+    """Runs `row` through the same form the create page uses; returns the
+    cleaned column values or the form's errors."""
+    if isinstance(row, MalformedRow):
+        return None, {"row": [row.error]}
+    if not isinstance(row, dict):
+        return None, {"row": ["not a JSON object"]}
+    form = form_class(formdata=_formdata(row), meta={"csrf": False})
+    if not form.validate():
+        return None, form.errors
+    return {name: form[name].data for name in fields
+            if name != "id" and name in form}, None
+
+
+def keep_id(row, cleaned):
+    """Carries an exported row's id over to `cleaned`, so that exported shows
+    still point at the venues and artists imported before them; returns the
+    errors if the id is malformed."""
+    id = row.get("id")
+    if id in (None, ""):
+        return None
+    try:
+        id = int(id)
+    except (TypeError, ValueError):
+        id = 0
+    if id < 1:
+        return {"id": ["id must be a positive integer"]}
+    cleaned["id"] = id
+    return None
+
+
+def unused_ids(model, values, report):
+    """Drops rows whose id is already taken, by an earlier row or in the
+    table, checking the whole batch with one IN query."""
+    ids = [value["id"] for _, value in values if "id" in value]
+    taken = {row.id for row in model.query.with_entities(model.id)
+             .filter(model.id.in_(ids))} if ids else set()
+    accepted = []
+    for line, value in values:
+        if "id" in value:
+            if value["id"] in taken:
+                report.errors.append((line, {"id": [f"id {value['id']} is already taken"]}))
+                continue
+            taken.add(value["id"])
+        accepted.append((line, value))
+    return accepted
+
+
+def reset_sequence(model):
+    """Moves a PostgreSQL id sequence past the ids imported as they were;
+    SQLite already picks max(id) + 1."""
+    if db.engine.dialect.name != "postgresql":
+        return
+    table = model.__tablename__
+    db.session.execute(db.text(
+        f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), "
+        f"(SELECT max(id) FROM \"{table}\"))"))
+
+
+def import_rows(kind, rows, batch_size=BATCH_SIZE):
+    model, form_class, fields = ENTITIES[kind]
+    report = ImportReport()
+    for number, batch in enumerate(batched(rows, batch_size)):
+        values = []
+        for offset, row in enumerate(batch, number * batch_size + 1):
+            cleaned, errors = validate(form_class, fields, row)
+            if not errors:
+                errors = keep_id(row, cleaned)
+            if errors:
+                report.errors.append((offset, errors))
+            else:
+                values.append((offset, cleaned))
+        values = unused_ids(model, values, report)
+        if kind == "shows":
+            values = existing_references(values, report)
+        else:
+            genres = {genre.name: genre for genre in Genre.query}
+            for _, value in values:
+                names = value.pop("genres")
+                for name in names:
+                    if name not in genres:
+                        genres[name] = Genre.named(name)
+                value["genre_rows"] = [genres[name] for name in names]
+        # rows keeping their ids go first, so that the sequence is past them
+        # before any other row takes its next value
+        kept = [(line, value) for line, value in values if "id" in value]
+        if kept:
+            insert_rows(kind, model, kept)
+            reset_sequence(model)
+        insert_rows(kind, model, [(line, value) for line, value in values
+                                  if "id" not in value])
+        db.session.commit()
+        db.session.expunge_all()
+        report.imported += len(values)
+        if kind == "shows" and values:
+            # as schedule_shows does, for the schedules the batch changed
+            invalidate_pages(*{f"venue:{value['venue_id']}" for _, value in values},
+                             *{f"artist:{value['artist_id']}" for _, value in values})
+    invalidate_pages(kind)
+    report.errors.sort(key=lambda error: error[0])
+    return report
+
+
+def insert_rows(kind, model, values):
+    if kind == "shows":
+        insert_shows(values)
+    else:
+        # ORM inserts so the genre associations are written too;
+        # psycopg2 sends each batch as multi-row VALUES statements
+        db.session.add_all(model(**value) for _, value in values)
+        db.session.flush()
+
+
+def existing_references(values, report, lock=False):
+    """Drops shows whose venue or artist id is malformed or missing, checking
+    the whole batch with one IN query per table. With `lock`, the rows found
+    stay locked until the transaction ends, in id order so that two batches
+    cannot deadlock."""
+    parsed = []
+    for line, value in values:
+        try:
+            value["venue_id"] = int(value["venue_id"])
+            value["artist_id"] = int(value["artist_id"])
+        except (TypeError, ValueError):
+            report.errors.append((line, {"id": ["venue_id and artist_id must be integers"]}))
+            continue
+        parsed.append((line, value))
+    found = {}
+    for model, column in ((Venue, "venue_id"), (Artist, "artist_id")):
+        query = model.query.with_entities(model.id).filter(
+            model.id.in_({value[column] for _, value in parsed}))
+        if lock:
+            query = query.order_by(model.id).with_for_update()
+        found[column] = {row.id for row in query}
+    venues, artists = found["venue_id"], found["artist_id"]
+    accepted = []
+    for line, value in parsed:
+        if value["venue_id"] not in venues:
+            report.errors.append((line, {"venue_id": [f"no venue {value['venue_id']}"]}))
+        elif value["artist_id"] not in artists:
+            report.errors.append((line, {"artist_id": [f"no artist {value['artist_id']}"]}))
+        else:
+            accepted.append((line, value))
+    return accepted
+
+
+def insert_shows(values):
+    """One executemany for the batch, then one counter update per venue and
+    artist instead of the per-row updates the Show mapper events issue."""
+    if not values:
+        return
+    now = datetime.now()
+    rows = [dict(value, counted_as_upcoming=value["start_time"] > now)
+            for _, value in values]
+    db.session.execute(Show.__table__.insert(), rows)
+    for model, column in ((Venue, "venue_id"), (Artist, "artist_id")):
+        counts = Counter(row[column] for row in rows if row["counted_as_upcoming"])
+        for id, count in counts.items():
+            model.query.filter(model.id == id).update(
+                {model.num_upcoming_shows: model.num_upcoming_shows + count},
+                synchronize_session=False)
+
+
+def export_rows(kind, batch_size=BATCH_SIZE):
+    """Yields every record as a dict, walking the table in id order one
+    keyset batch at a time so memory stays flat."""
+    model, _, fields = ENTITIES[kind]
+    last_id = 0
+    while True:
+        batch = model.query.filter(model.id > last_id)\
+            .order_by(model.id).limit(batch_size).all()
+        if not batch:
+            return
+        for instance in batch:
+            row = {name: getattr(instance, name) for name in fields}
+            if "genres" in row:
+                row["genres"] = list(row["genres"])
+            if "start_time" in row:
+                # the format ShowForm parses on the way back in
+                row["start_time"] = row["start_time"].strftime("%Y-%m-%d %H:%M:%S")
+            yield row
+        last_id = batch[-1].id
+        db.session.expunge_all()
+
+
+def write_rows(file, format, kind, rows):
+    fields = ENTITIES[kind][2]
+    if format == "csv":
+        writer = csv.DictWriter(file, fieldnames=fields)
+        writer.writeheader()
+    for count, row in enumerate(rows, 1):
+        if format == "csv":
+            if "genres" in row:
+                row["genres"] = ",".join(row["genres"])
+            writer.writerow(row)
+        else:
+            file.write(json.dumps(row) + "\n")
+        yield count
@@ -0,0 +1,345 @@
+import pickle
+import time
+from bisect import bisect_left
+from datetime import datetime
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+
+from flask import current_app, g, make_response, request, session
+from formatting import get_locale
+from routing import use_primary
+
+#----------------------------------------------------------------------------#
+# Cache backends.
+#----------------------------------------------------------------------------#
+
+
+class LRUCache:
+    """Bounded in-process cache; entries expire after `ttl` seconds and the
+    least recently used entry is evicted once `max_entries` is reached."""
+
+    def __init__(self, max_entries=1024, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.tags = {}
+        self.lock = Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value, _ = entry
+            if expires < time.monotonic():
+                self._drop(key)
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, tags=(), ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        with self.lock:
+            if key in self.entries:
+                self._drop(key)
+            self.entries[key] = (time.monotonic() + ttl, value, tags)
+            for tag in tags:
+                self.tags.setdefault(tag, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                self._drop(next(iter(self.entries)))
+
+    def invalidate(self, *tags):
+        with self.lock:
+            for tag in tags:
+                for key in self.tags.pop(tag, ()):
+                    self._drop(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.tags.clear()
+
+    def _drop(self, key):
+        _, _, tags = self.entries.pop(key, (None, None, ()))
+        for tag in tags:
+            keys = self.tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tags[tag]
+
+
+class RedisCache:
+    """Shares cached pages between workers through any client exposing the
+    redis-py `get`/`set`/`delete`/`sadd`/`smembers`/`expire` calls."""
+
+    def __init__(self, client, ttl=60, prefix="fyyur:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return None if value is None else pickle.loads(value)
+
+    def set(self, key, value, tags=(), ttl=None):
+        ttl = max(int(self.ttl if ttl is None else ttl), 1)
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=ttl)
+        for tag in tags:
+            tag_key = f"{self.prefix}tag:{tag}"
+            self.client.sadd(tag_key, key)
+            # a tag set must outlive every entry it points at
+            self.client.expire(tag_key, max(ttl, self.ttl))
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            tag_key = f"{self.prefix}tag:{tag}"
+            keys = [self.prefix + (key.decode() if isinstance(key, bytes) else key)
+                    for key in self.client.smembers(tag_key)]
+            self.client.delete(tag_key, *keys)
+
+    def clear(self):
+        for key in self.client.keys(self.prefix + "*"):
+            self.client.delete(key)
+
+#----------------------------------------------------------------------------#
+# Page cache.
+#----------------------------------------------------------------------------#
+
+
+class PageCache:
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # show schedules share the backend but not the page hit ratio
+        self.schedule_hits = 0
+        self.schedule_misses = 0
+
+    def _count(self, counter):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, key, counters=""):
+        """The cached value or None, counted as a hit or miss of the
+        `counters` prefix; pages by default, "schedule_" for schedules."""
+        value = self.backend.get(key)
+        self._count(counters + ("misses" if value is None else "hits"))
+        return value
+
+    def set(self, key, value, tags, ttl=None):
+        self.backend.set(key, value, tags, ttl)
+
+    def invalidate(self, *tags):
+        self._count("invalidations")
+        self.backend.invalidate(*tags)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "backend": type(self.backend).__name__,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "schedule_hits": self.schedule_hits,
+                "schedule_misses": self.schedule_misses
+            }
+
+
+def redis_client(setting):
+    """A client for REDIS_URL, for the `setting` that chose redis; the
+    package is an extra, in requirements-redis.txt."""
+    try:
+        import redis
+    except ImportError:
+        raise RuntimeError(f"{setting}=redis needs the redis package; "
+                           "pip install -r requirements-redis.txt")
+    return redis.Redis.from_url(current_app.config["PAGE_CACHE_REDIS_URL"])
+
+
+def get_page_cache():
+    extensions = current_app.extensions
+    if "page_cache" not in extensions:
+        config = current_app.config
+        backend = config.get("PAGE_CACHE", "memory")
+        if backend == "redis":
+            backend = RedisCache(redis_client("PAGE_CACHE"),
+                                 ttl=config["PAGE_CACHE_TTL"])
+        elif backend == "memory":
+            backend = LRUCache(config["PAGE_CACHE_MAX_ENTRIES"],
+                               ttl=config["PAGE_CACHE_TTL"])
+        else:
+            backend = None
+        extensions["page_cache"] = backend and PageCache(backend)
+    return extensions["page_cache"]
+
+
+def cached_page(*tags):
+    """Caches a GET view's rendered HTML under its locale, path and query
+    string.
+
+    `tags` are formatted with the view arguments ("venue:{venue_id}") and
+    the view may add more with `cache_tags`; write handlers drop every page
+    carrying a tag with `invalidate_pages`. Pages are neither served from
+    nor stored in the cache while flash messages are pending, since those
+    are per-user. A miss is rendered from the primary, not a replica.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            cache = get_page_cache()
+            if cache is None or request.method != "GET" or "_flashes" in session:
+                return view(**kwargs)
+            key = f"page:{get_locale()}:{request.full_path}"
+            cached = cache.get(key)
+            if cached is not None:
+                body, mimetype, etag = cached
+                response = make_response(body)
+                response.mimetype = mimetype
+                if etag is not None:
+                    response.set_etag(etag)
+                    response.make_conditional(request)
+                return response
+            use_primary()
+            g.cache_tags = {tag.format(**kwargs) for tag in tags}
+            g.cache_ttl = current_app.config["PAGE_CACHE_TTL"]
+            response = make_response(view(**kwargs))
+            if response.status_code == 200 and "_flashes" not in session \
+                    and g.cache_ttl > 0:
+                if response.is_streamed:
+                    response.response = _cache_when_sent(
+                        response.response, cache, key, response.mimetype,
+                        g.cache_tags, g.cache_ttl,
+                        current_app.config["PAGE_CACHE_MAX_STREAMED_BYTES"])
+                else:
+                    cache.set(key, (response.get_data(), response.mimetype,
+                                    response.get_etag()[0]),
+                              g.cache_tags, g.cache_ttl)
+            return response
+        return wrapper
+    return decorator
+
+
+def _cache_when_sent(chunks, cache, key, mimetype, tags, ttl, limit):
+    """Passes a streamed body through, caching it once it has been sent in
+    full unless it grew past `limit` bytes. Runs outside the request
+    context, as the server consumes the response."""
+    body, size = [], 0
+    for chunk in chunks:
+        chunk = chunk.encode() if isinstance(chunk, str) else chunk
+        if body is not None:
+            size += len(chunk)
+            if size <= limit:
+                body.append(chunk)
+            else:
+                body = None
+        yield chunk
+    if body is not None:
+        cache.set(key, (b"".join(body), mimetype, None), tags, ttl)
+
+
+def conditional(view):
+    """Gives a view's 200 responses a strong ETag over their body and answers
+    a matching If-None-Match with an empty 304.
+
+    Put it under `cached_page`, which stores the ETag with the body so that
+    a cache hit is revalidated without hashing or sending the body again.
+    """
+    @wraps(view)
+    def wrapper(**kwargs):
+        response = make_response(view(**kwargs))
+        if response.status_code == 200:
+            response.add_etag()
+            response.make_conditional(request)
+        return response
+    return wrapper
+
+
+def cache_tags(*tags):
+    if "cache_tags" in g:
+        g.cache_tags.update(tags)
+
+
+def cache_until(moment):
+    """Stops the current page being served from the cache once `moment`
+    passes, e.g. when the next upcoming show becomes a past show."""
+    if "cache_ttl" in g and moment is not None:
+        remaining = (moment - datetime.now()).total_seconds()
+        g.cache_ttl = max(min(g.cache_ttl, remaining), 0)
+
+
+def invalidate_pages(*tags):
+    cache = get_page_cache()
+    if cache is not None:
+        cache.invalidate(*tags)
+
+#----------------------------------------------------------------------------#
+# Show schedules.
+#----------------------------------------------------------------------------#
+
+
+class ShowSchedule:
+    """A venue's or artist's details and shows, sorted by start time.
+
+    Nothing in it depends on the clock, so it stays valid until a write
+    invalidates it; the past/upcoming split is redone per request by
+    bisecting the start times, and the earliest upcoming start time is the
+    next moment that split changes.
+    """
+
+    def __init__(self, details, shows, tags=()):
+        self.details = details
+        self.shows = sorted(shows, key=lambda show: show["start_time"])
+        self.start_times = [show["start_time"] for show in self.shows]
+        self.tags = set(tags)
+
+    def _split(self, now):
+        # shows starting exactly at `now` count as upcoming
+        return bisect_left(self.start_times, now)
+
+    def partition(self, now):
+        split = self._split(now)
+        return self.shows[:split], self.shows[split:]
+
+    def next_boundary(self, now):
+        split = self._split(now)
+        return self.start_times[split] if split < len(self.start_times) else None
+
+
+def cached_schedule(kind, id, load):
+    """Returns the ShowSchedule for `kind` ("venue"/"artist") `id`, calling
+    `load` on a miss, from the primary; `load` returns None when the entity
+    does not exist."""
+    cache = get_page_cache()
+    key = f"schedule:{kind}:{id}"
+    schedule = cache.get(key, "schedule_") if cache is not None else None
+    if schedule is None:
+        if cache is not None:
+            use_primary()
+        schedule = load()
+        if cache is not None and schedule is not None:
+            cache.set(key, schedule, {f"{kind}:{id}"} | schedule.tags,
+                      current_app.config["SCHEDULE_CACHE_TTL"])
+    return schedule
+
+
+def schedule_detail(kind, id, load):
+    """A venue's or artist's details with its shows split into past and
+    upcoming; raises ValueError when it does not exist."""
+    schedule = cached_schedule(kind, id, load)
+    if(schedule is None):
+        raise ValueError(f"{kind}_id does not exist")
+    now = datetime.now()
+    past_shows, upcoming_shows = schedule.partition(now)
+    cache_tags(*schedule.tags)
+    cache_until(schedule.next_boundary(now))
+    data = dict(schedule.details)
+    data["past_shows"] = past_shows
+    data["upcoming_shows"] = upcoming_shows
+    data["past_shows_count"] = len(past_shows)
+    data["upcoming_shows_count"] = len(upcoming_shows)
+    return data
@@ -0,0 +1,130 @@
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+import assets
+import bulk
+import scheduling
+import seed
+from counters import rebuild_show_counters, roll_show_counters
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+
+@click.command("roll-show-counters")
+@with_appcontext
+@click.option("--rebuild", is_flag=True, help="Recount every venue and artist.")
+def roll_show_counters_command(rebuild):
+    """Moves started shows out of the upcoming show counters; run every
+    minute or so from cron."""
+    if rebuild:
+        rebuild_show_counters()
+        click.echo("Rebuilt upcoming show counters")
+    else:
+        click.echo(f"Rolled {roll_show_counters()} started shows")
+
+
+@click.command("import-data")
+@with_appcontext
+@click.argument("kind", type=click.Choice(list(bulk.ENTITIES)))
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "format", type=click.Choice(["csv", "jsonl"]),
+              help="Defaults to the file extension.")
+@click.option("--batch-size", default=bulk.BATCH_SIZE, show_default=True)
+def import_data_command(kind, path, format, batch_size):
+    """Streams venues, artists or shows from a CSV or JSON Lines file,
+    validated with the same forms as the create pages. Rows keep their id,
+    if they have one, so an export-data dump imports as it was."""
+    try:
+        format = bulk.file_format(path, format)
+    except ValueError as error:
+        raise click.UsageError(str(error))
+    with open(path, newline="") as file:
+        report = bulk.import_rows(kind, bulk.read_rows(file, format), batch_size)
+    for line, errors in report.errors:
+        click.echo(f"row {line}: {errors}", err=True)
+    click.echo(f"Imported {report.imported} {kind}, rejected "
+               f"{len(report.errors)} ({report.rows_per_second:.0f} rows/sec)")
+
+
+@click.command("schedule-shows")
+@with_appcontext
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "format", type=click.Choice(["csv", "jsonl"]),
+              help="Defaults to the file extension.")
+@click.option("--window", type=click.IntRange(min=0),
+              help="Minutes two shows at a venue or by an artist must be "
+                   "apart; defaults to SHOW_CONFLICT_WINDOW_MINUTES.")
+@click.option("--strict", is_flag=True, help="Book nothing unless every show is accepted.")
+def schedule_shows_command(path, format, window, strict):
+    """Books a tour of shows from a CSV or JSON Lines file in one
+    transaction, rejecting double bookings."""
+    try:
+        format = bulk.file_format(path, format)
+    except ValueError as error:
+        raise click.UsageError(str(error))
+    report = bulk.ImportReport()
+    with open(path, newline="") as file:
+        values = scheduling.validate_rows(bulk.read_rows(file, format), report)
+    report = scheduling.schedule_shows(values, scheduling.booking_window(window),
+                                       strict, report)
+    for line, errors in report.errors:
+        click.echo(f"row {line}: {errors}", err=True)
+    if strict and report.errors:
+        raise click.ClickException(f"Booked nothing, {len(report.errors)} shows rejected")
+    click.echo(f"Booked {report.imported} shows, rejected {len(report.errors)}")
+
+
+@click.command("export-data")
+@with_appcontext
+@click.argument("kind", type=click.Choice(list(bulk.ENTITIES)))
+@click.argument("file", type=click.File("w"))
+@click.option("--format", "format", type=click.Choice(["csv", "jsonl"]),
+              help="Defaults to the file extension.")
+def export_data_command(kind, file, format):
+    """Streams every venue, artist or show to a CSV or JSON Lines file
+    ("-" for stdout)."""
+    try:
+        format = bulk.file_format(file.name, format)
+    except ValueError as error:
+        raise click.UsageError(str(error))
+    started = time.perf_counter()
+    count = 0
+    for count in bulk.write_rows(file, format, kind, bulk.export_rows(kind)):
+        pass
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    click.echo(f"Exported {count} {kind} ({count / elapsed:.0f} rows/sec)", err=True)
+
+
+@click.command("seed-data")
+@with_appcontext
+@click.option("--scale", type=click.Choice(list(seed.SCALES)), default="small",
+              show_default=True, help="Venues, artists and shows: " + ", ".join(
+                  f"{name} {'/'.join(map(str, counts))}" for name, counts in seed.SCALES.items()))
+@click.option("--shows", type=int, help="Overrides the scale's show count.")
+@click.option("--seed", "seed_value", default=0, show_default=True,
+              help="The same seed generates the same data.")
+def seed_data_command(scale, shows, seed_value):
+    """Adds synthetic venues, artists and shows for development and
+    benchmarks."""
+    venues, artists, scale_shows = seed.SCALES[scale]
+    seed.generate(venues, artists, shows if shows is not None else scale_shows,
+                  seed_value, echo=click.echo)
+
+
+@click.command("build-assets")
+@with_appcontext
+def build_assets_command():
+    """Bundles, minifies, fingerprints and precompresses the static files
+    into static/dist; run on every deploy. Needs requirements-assets.txt."""
+    try:
+        assets.build_assets(current_app.static_folder, echo=click.echo)
+    except ImportError as error:
+        raise click.ClickException(f"{error}; pip install -r requirements-assets.txt")
+
+
+COMMANDS = [roll_show_counters_command, import_data_command, export_data_command,
+            schedule_shows_command, seed_data_command, build_assets_command]
@@ -0,0 +1,55 @@
+from collections import Counter
+from datetime import datetime
+
+from cache import invalidate_pages
+from models import db, Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Upcoming show counters.
+#----------------------------------------------------------------------------#
+
+ROLL_BATCH_SIZE = 10000
+
+
+def roll_show_counters(now=None):
+    """Moves shows that have started out of their venue's and artist's
+    `num_upcoming_shows`. Run periodically (see `flask roll-show-counters`);
+    between runs the counters over-report by the shows started since."""
+    now = now or datetime.now()
+    rolled = 0
+    while True:
+        started = Show.query\
+            .with_entities(Show.id, Show.venue_id, Show.artist_id)\
+            .filter(Show.counted_as_upcoming, Show.start_time <= now)\
+            .order_by(Show.start_time)\
+            .limit(ROLL_BATCH_SIZE).with_for_update().all()
+        if not started:
+            break
+        Show.query.filter(Show.id.in_([show.id for show in started]))\
+            .update({Show.counted_as_upcoming: False}, synchronize_session=False)
+        for model, column in ((Venue, "venue_id"), (Artist, "artist_id")):
+            counts = Counter(getattr(show, column) for show in started)
+            for id, count in counts.items():
+                model.query.filter(model.id == id).update(
+                    {model.num_upcoming_shows: model.num_upcoming_shows - count},
+                    synchronize_session=False)
+        db.session.commit()
+        rolled += len(started)
+    if rolled:
+        invalidate_pages("venues")
+    return rolled
+
+
+def rebuild_show_counters(now=None):
+    """Recomputes every counter from the Show table."""
+    now = now or datetime.now()
+    Show.query.update({Show.counted_as_upcoming: Show.start_time > now},
+                      synchronize_session=False)
+    for model, column in ((Venue, Show.venue_id), (Artist, Show.artist_id)):
+        upcoming = db.select(db.func.count(Show.id))\
+            .where(column == model.id, Show.counted_as_upcoming)\
+            .scalar_subquery()
+        model.query.update({model.num_upcoming_shows: upcoming},
+                           synchronize_session=False)
+    db.session.commit()
+    invalidate_pages("venues")
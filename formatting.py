@@ -0,0 +1,44 @@
+from datetime import datetime
+from functools import lru_cache
+
+import babel
+import babel.dates
+import dateutil.parser
+from flask import current_app, g, has_request_context, request
+
+#----------------------------------------------------------------------------#
+# Date formatting.
+#----------------------------------------------------------------------------#
+
+DATETIME_FORMATS = {
+    "full": "EEEE MMMM, d, y 'at' h:mma",
+    "medium": "EE MM, dd, y h:mma",
+}
+
+
+@lru_cache(maxsize=256)
+def datetime_pattern(format, locale):
+    """The parsed Babel pattern and Locale for a (format, locale) pair, so a
+    page full of show tiles resolves them once instead of once per tile."""
+    return (babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format)),
+            babel.Locale.parse(locale))
+
+
+def get_locale():
+    """The request's locale: `g.locale` when a view has set one, otherwise
+    the best Accept-Language match among the LOCALES setting."""
+    config = current_app.config
+    if not has_request_context():
+        return config["DEFAULT_LOCALE"]
+    if "locale" not in g:
+        g.locale = request.accept_languages.best_match(
+            config["LOCALES"], config["DEFAULT_LOCALE"])
+    return g.locale
+
+
+def format_datetime(value, format='medium', locale=None):
+    # datetimes come straight from the database; only strings need parsing
+    if not isinstance(value, datetime):
+        value = dateutil.parser.parse(str(value))
+    pattern, locale = datetime_pattern(format, locale or get_locale())
+    return pattern.apply(value, locale)
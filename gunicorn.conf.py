@@ -0,0 +1,59 @@
+"""gunicorn settings; every one can be overridden from the environment.
+
+The app is imported once in the master before forking (preload_app), so
+templates, forms and the compiled Jinja environment are shared between the
+workers copy-on-write. Send the master HUP to restart the workers
+gracefully with the same code, or USR2 then QUIT to the old master to load
+new code with no dropped requests.
+"""
+import multiprocessing
+import os
+import tempfile
+
+bind = os.environ.get("BIND", "0.0.0.0:" + os.environ.get("PORT", "8000"))
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+preload_app = True
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = 5
+# recycle workers now and then so slow leaks cannot build up
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 10000))
+max_requests_jitter = max_requests // 10
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG")
+errorlog = "-"
+# where the workers share their /metrics totals; set before the app is
+# preloaded, as config.py reads it
+os.environ.setdefault("METRICS_DIR", os.path.join(
+    tempfile.gettempdir(), f"fyyur-metrics-{os.getpid()}"))
+
+
+def on_starting(server):
+    from metrics import clear_process_files
+    clear_process_files(os.environ["METRICS_DIR"])
+
+
+def post_fork(server, worker):
+    # connections opened by the master while preloading must not be shared
+    # across processes; each worker starts with empty pools
+    from models import db
+    app = server.app.wsgi()
+    with app.app_context():
+        db.engine.dispose()
+        for bind in app.config["SQLALCHEMY_BINDS"]:
+            db.get_engine(app, bind=bind).dispose()
+
+
+def worker_exit(server, worker):
+    # what the worker counted since its last write
+    app = server.app.wsgi()
+    files = app.extensions.get("metrics_files")
+    if files is not None:
+        files.write(app)
+
+
+def child_exit(server, worker):
+    # in the master: keep the exited worker's counters, drop its file
+    files = server.app.wsgi().extensions.get("metrics_files")
+    if files is not None:
+        files.retire(worker.pid)
@@ -1,10 +1,60 @@
+import logging
+from logging import Formatter, FileHandler
+
+import click
 from flask import Flask
-from flask_moment import Moment
+from assets import init_assets
+from cache import get_page_cache
+from models import db, init_db
+from profiling import configure_profiling
+from recent import get_recent_items
+import api
+import artists
+import commands
+import metrics
+import pages
+import shows
+import venues
 
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
+
+def create_app(config="config"):
+    """Builds an app from `config`, an import path or object as taken by
+    `config.from_object`, so tests and tools can each make their own."""
+    app = Flask(__name__)
+    app.config.from_object(config)
+    init_db(app)
+    configure_profiling(app, db)
+    init_assets(app)
+    if click.get_current_context(silent=True) is not None:
+        # only the `flask db` commands need alembic; servers skip importing it
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+    for module in (pages, venues, artists, shows, api, metrics):
+        app.register_blueprint(module.blueprint)
+    for command in commands.COMMANDS:
+        app.cli.add_command(command)
+    with app.app_context():
+        # a PAGE_CACHE or RECENT_ITEMS_BROADCAST backend that is not
+        # installed fails here, at startup
+        get_page_cache()
+        recent = get_recent_items()
+        if click.get_current_context(silent=True) is None:
+            # the CLI has no home page to serve
+            recent.preload()
+
+    if not app.debug:
+        file_handler = FileHandler('error.log')
+        file_handler.setFormatter(
+            Formatter(
+                '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+        )
+        app.logger.setLevel(logging.INFO)
+        file_handler.setLevel(logging.INFO)
+        app.logger.addHandler(file_handler)
+        app.logger.info('errors')
+    return app
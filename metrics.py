@@ -0,0 +1,406 @@
+import json
+import os
+import sys
+import time
+import weakref
+from bisect import bisect_left
+from threading import Lock, RLock, Thread, current_thread, local
+
+from flask import Blueprint, Response, current_app, g, request
+from cache import get_page_cache
+from models import db
+from pool import pool_stats
+
+blueprint = Blueprint("metrics", __name__)
+
+#----------------------------------------------------------------------------#
+# Metrics registry.
+#----------------------------------------------------------------------------#
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+METRICS = {
+    "fyyur_request_duration_seconds": ("histogram", "Time to build a response, by endpoint."),
+    "fyyur_db_duration_seconds": ("histogram", "SQL time per request, by endpoint."),
+    "fyyur_render_duration_seconds": ("histogram", "Template render time per request, by endpoint."),
+    "fyyur_db_queries_total": ("counter", "SQL statements executed, by endpoint."),
+    "fyyur_errors_total": ("counter", "Responses from the error handlers, by code."),
+    "fyyur_page_cache_hits_total": ("counter", "Page cache hits."),
+    "fyyur_page_cache_misses_total": ("counter", "Page cache misses."),
+    "fyyur_page_cache_invalidations_total": ("counter", "Page cache tag invalidations."),
+    "fyyur_schedule_cache_hits_total": ("counter", "Show schedule cache hits."),
+    "fyyur_schedule_cache_misses_total": ("counter", "Show schedule cache misses."),
+    "fyyur_db_pool_size": ("gauge", "Connections the pool keeps open."),
+    "fyyur_db_pool_checked_out": ("gauge", "Connections in use."),
+    "fyyur_db_pool_overflow": ("gauge", "Connections open beyond the pool size."),
+    "fyyur_db_pool_checkouts_total": ("counter", "Connection checkouts."),
+    "fyyur_db_pool_timeouts_total": ("counter", "Checkouts that gave up waiting."),
+    "fyyur_db_pool_wait_seconds_total": ("counter", "Time spent waiting for connections."),
+    "fyyur_db_pool_wait_seconds_max": ("gauge", "Longest wait for a connection."),
+}
+
+
+class Registry:
+    """Counters and histograms kept in a shard per thread, so recording is a
+    couple of dict and list updates with no lock to contend on; a scrape
+    adds the shards up. Values are per process; see ProcessFiles."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.shards = []
+        # what threads that have since finished recorded
+        self.retired = ({}, {})
+        # reentrant, as a thread may be collected, and retired, while the
+        # collecting thread holds the lock
+        self.lock = RLock()
+        self.local = local()
+
+    def _shard(self):
+        try:
+            return self.local.shard
+        except AttributeError:
+            # once per thread
+            shard = self.local.shard = ({}, {})
+            with self.lock:
+                self.shards.append(shard)
+            # a server may start a thread per request; fold each shard into
+            # the retired totals once its thread is gone
+            weakref.finalize(current_thread(), self._retire, shard)
+            return shard
+
+    def _retire(self, shard):
+        with self.lock:
+            self.shards.remove(shard)
+            _merge(self.retired, shard)
+
+    def inc(self, name, labels=(), amount=1):
+        counters = self._shard()[0]
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        histograms = self._shard()[1]
+        key = (name, labels)
+        histogram = histograms.get(key)
+        if histogram is None:
+            # a count per bucket, then +Inf, then the sum
+            histogram = histograms[key] = [0] * (len(self.buckets) + 2)
+        histogram[bisect_left(self.buckets, value)] += 1
+        histogram[-1] += value
+
+    def collect(self):
+        totals = ({}, {})
+        with self.lock:
+            shards = list(self.shards)
+            _merge(totals, self.retired)
+        for shard in shards:
+            _merge(totals, shard)
+        return totals
+
+
+def _merge(totals, shard):
+    counters, histograms = totals
+    shard_counters, shard_histograms = shard
+    # copies are taken in one step, so a thread recording a new series
+    # meanwhile cannot break the iteration
+    for key, value in shard_counters.copy().items():
+        counters[key] = counters.get(key, 0) + value
+    for key, values in shard_histograms.copy().items():
+        total = histograms.setdefault(key, [0] * len(values))
+        for index, value in enumerate(list(values)):
+            total[index] += value
+
+
+#  Worker processes
+#  ----------------------------------------------------------------
+
+
+def _keyed(gauges):
+    return {(name, labels): value for name, labels, value in gauges}
+
+
+def _dump(counters, histograms, gauges=None):
+    gauges = gauges or {}
+    return {
+        "counters": [[name, labels, value] for (name, labels), value in counters.items()],
+        "histograms": [[name, labels, values] for (name, labels), values in histograms.items()],
+        "gauges": [[name, labels, value] for (name, labels), value in gauges.items()],
+    }
+
+
+def _load(data):
+    def key(name, labels):
+        return name, tuple(tuple(label) for label in labels)
+    return ({key(name, labels): value for name, labels, value in data["counters"]},
+            {key(name, labels): values for name, labels, values in data["histograms"]},
+            {key(name, labels): value for name, labels, value in data["gauges"]})
+
+
+def _merge_gauges(totals, gauges):
+    # a pool's connections add up across workers; its longest wait does not
+    for key, value in gauges.items():
+        if key in totals and key[0].endswith("_max"):
+            totals[key] = max(totals[key], value)
+        else:
+            totals[key] = totals.get(key, 0) + value
+
+
+def _read(path):
+    """A worker's file, or None if it went away meanwhile."""
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _write(path, data):
+    # replaced in one step, so a scrape never reads half a file
+    temporary = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.tmp")
+    with open(temporary, "w") as file:
+        json.dump(data, file)
+    os.replace(temporary, path)
+
+
+class ProcessFiles:
+    """Shares the totals of forked workers, such as gunicorn's, through
+    METRICS_DIR. Each worker writes its registry and gauges to a file of
+    its own every `interval` seconds, and a scrape, served by whichever
+    worker accepts it, adds the other workers' files to its own values.
+    When a worker exits the master folds its file into retired.json, so
+    counters carry on across restarts and the files stay few.
+    """
+
+    RETIRED = "retired.json"
+
+    def __init__(self, directory, interval=5):
+        self.directory = directory
+        self.interval = interval
+        self.lock = Lock()
+        self.pid = None
+        self.name = None
+
+    def start(self, app):
+        # on each worker's first request: a forked worker inherits this
+        # object from the master that preloaded the app, but not its thread
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            # unique even if the pid of an exited worker is reused
+            self.name = f"{self.pid}-{time.time_ns()}.json"
+            Thread(target=self._write_every_interval, args=(app,),
+                   name="metrics-files", daemon=True).start()
+
+    def _write_every_interval(self, app):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.write(app)
+            except:
+                print(sys.exc_info())
+
+    def write(self, app):
+        if self.pid != os.getpid():
+            return
+        with app.app_context():
+            gauges = scrape_gauges()
+        counters, histograms = get_registry(app).collect()
+        _write(os.path.join(self.directory, self.name),
+               _dump(counters, histograms, _keyed(gauges)))
+
+    def collect(self, registry, gauges):
+        """`registry` and `gauges`, this worker's, plus every other
+        worker's, live or retired."""
+        files = {}
+        for name in os.listdir(self.directory):
+            if name.endswith(".json") and name not in (self.RETIRED, self.name):
+                data = _read(os.path.join(self.directory, name))
+                if data is not None:
+                    files[name] = data
+        # read after the worker files: a file folded in meanwhile is
+        # either gone already or listed here, so never counted twice
+        retired = _read(os.path.join(self.directory, self.RETIRED))
+        if retired is not None:
+            for name in retired["files"]:
+                files.pop(name, None)
+            files[self.RETIRED] = retired
+        counters, histograms = registry.collect()
+        totals = {}
+        _merge_gauges(totals, _keyed(gauges))
+        for data in files.values():
+            file_counters, file_histograms, file_gauges = _load(data)
+            _merge((counters, histograms), (file_counters, file_histograms))
+            _merge_gauges(totals, file_gauges)
+        return counters, histograms, [(name, labels, value)
+                                      for (name, labels), value in totals.items()]
+
+    def retire(self, pid):
+        """Folds the file of exited worker `pid` into retired.json, keeping
+        its counters but not its gauges of the moment. Runs in the master."""
+        names = [name for name in os.listdir(self.directory)
+                 if name.startswith(f"{pid}-") and name.endswith(".json")]
+        if not names:
+            return
+        path = os.path.join(self.directory, self.RETIRED)
+        retired = _read(path) or {"files": [], **_dump({}, {})}
+        counters, histograms, gauges = _load(retired)
+        for name in names:
+            data = _read(os.path.join(self.directory, name))
+            if data is None:
+                continue
+            file_counters, file_histograms, file_gauges = _load(data)
+            _merge((counters, histograms), (file_counters, file_histograms))
+            _merge_gauges(gauges, {key: value for key, value in file_gauges.items()
+                                   if key[0].endswith("_total")})
+        # the names of files removed by an earlier fold are no longer needed
+        folded = [name for name in retired["files"]
+                  if os.path.exists(os.path.join(self.directory, name))]
+        _write(path, dict(_dump(counters, histograms, gauges), files=folded + names))
+        for name in names:
+            os.remove(os.path.join(self.directory, name))
+
+
+def clear_process_files(directory):
+    """Empties METRICS_DIR before the first worker starts."""
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith(".json"):
+            os.remove(os.path.join(directory, name))
+
+#  Exposition
+#  ----------------------------------------------------------------
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def exposition(buckets, counters, histograms, gauges=()):
+    """Collected counters and histograms plus `gauges`, ((name, labels,
+    value), ...) read at scrape time, in the Prometheus text format."""
+    samples = {}
+    for (name, labels), value in sorted(counters.items()):
+        samples.setdefault(name, []).append(f"{name}{_labels(labels)} {value}")
+    for name, labels, value in gauges:
+        samples.setdefault(name, []).append(f"{name}{_labels(labels)} {value}")
+    for (name, labels), values in sorted(histograms.items()):
+        lines = samples.setdefault(name, [])
+        cumulative = 0
+        for bound, count in zip(buckets + ("+Inf",), values):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {cumulative}")
+        lines.append(f"{name}_sum{_labels(labels)} {values[-1]}")
+        lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+    output = []
+    for name in sorted(samples):
+        kind, help = METRICS[name]
+        output.append(f"# HELP {name} {help}")
+        output.append(f"# TYPE {name} {kind}")
+        output.extend(samples[name])
+    return "\n".join(output) + "\n"
+
+
+def get_registry(app=None):
+    return (app or current_app).extensions["metrics"]
+
+
+def record_error(code):
+    """Counts a response from an error handler."""
+    if "metrics" in current_app.extensions:
+        get_registry().inc("fyyur_errors_total",
+                           (("code", code), ("endpoint", request.endpoint or "")))
+
+#----------------------------------------------------------------------------#
+# Instrumentation.
+#----------------------------------------------------------------------------#
+
+
+@blueprint.record_once
+def create_registry(state):
+    state.app.extensions["metrics"] = Registry()
+    directory = state.app.config["METRICS_DIR"]
+    if directory:
+        state.app.extensions["metrics_files"] = ProcessFiles(
+            directory, state.app.config["METRICS_WRITE_SECONDS"])
+
+
+@blueprint.before_app_request
+def start_timer():
+    files = current_app.extensions.get("metrics_files")
+    if files is not None:
+        files.start(current_app._get_current_object())
+    g.metrics_started = time.perf_counter()
+
+
+@blueprint.after_app_request
+def observe_request(response):
+    started = g.pop("metrics_started", None)
+    if started is None or request.endpoint == "metrics.metrics":
+        return response
+    registry = get_registry()
+    # unmatched URLs share one series instead of one per path
+    endpoint = (("endpoint", request.endpoint or ""),)
+    method = request.method
+    # left by profiling.py, whose after_request runs after this one
+    profile = g.get("profile")
+
+    def observe():
+        registry.observe("fyyur_request_duration_seconds",
+                         endpoint + (("method", method),),
+                         time.perf_counter() - started)
+        if profile is not None:
+            registry.observe("fyyur_db_duration_seconds", endpoint, profile.db_seconds)
+            registry.observe("fyyur_render_duration_seconds", endpoint, profile.render_seconds)
+            registry.inc("fyyur_db_queries_total", endpoint, len(profile.queries))
+    if response.is_streamed:
+        # a streamed body renders, and queries, as it is sent
+        response.call_on_close(observe)
+    else:
+        observe()
+    return response
+
+
+def scrape_gauges():
+    gauges = []
+    engines = [("primary", db.engine)] + [
+        (bind, db.get_engine(current_app, bind=bind))
+        for bind in current_app.config["SQLALCHEMY_BINDS"]]
+    for bind, engine in engines:
+        stats = pool_stats(engine)
+        for stat in ("size", "checked_out", "overflow", "checkouts", "timeouts",
+                     "wait_seconds_total", "wait_seconds_max"):
+            if stat in stats:
+                name = f"fyyur_db_pool_{stat}"
+                if name not in METRICS:
+                    name += "_total"
+                gauges.append((name, (("bind", bind),), stats[stat]))
+    cache = get_page_cache()
+    if cache:
+        stats = cache.stats()
+        for stat in ("hits", "misses", "invalidations"):
+            gauges.append((f"fyyur_page_cache_{stat}_total",
+                           (("backend", stats["backend"]),), stats[stat]))
+        for stat in ("hits", "misses"):
+            gauges.append((f"fyyur_schedule_cache_{stat}_total",
+                           (("backend", stats["backend"]),), stats[f"schedule_{stat}"]))
+    return gauges
+
+
+@blueprint.route('/metrics')
+def metrics():
+    registry = get_registry()
+    files = current_app.extensions.get("metrics_files")
+    if files is not None:
+        counters, histograms, gauges = files.collect(registry, scrape_gauges())
+    else:
+        counters, histograms = registry.collect()
+        gauges = scrape_gauges()
+    return Response(exposition(registry.buckets, counters, histograms, gauges),
+                    mimetype="text/plain; version=0.0.4")
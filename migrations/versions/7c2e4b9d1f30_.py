@@ -0,0 +1,49 @@
+"""add indexes for hot filter and join columns
+
+Revision ID: 7c2e4b9d1f30
+Revises: 310882925aa6
+Create Date: 2022-06-02 10:41:08.112903
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2e4b9d1f30'
+down_revision = '310882925aa6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # trigram operator classes back the ilike('%term%') name searches
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index('ix_show_venue_id_start_time', 'Show',
+                    ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_show_artist_id_start_time', 'Show',
+                    ['artist_id', 'start_time'], unique=False)
+    op.create_index('ix_show_start_time', 'Show',
+                    ['start_time'], unique=False)
+    op.create_index('ix_venue_lower_city_lower_state', 'Venue',
+                    [sa.text('lower(city)'), sa.text('lower(state)')],
+                    unique=False)
+    op.create_index('ix_artist_lower_city_lower_state', 'Artist',
+                    [sa.text('lower(city)'), sa.text('lower(state)')],
+                    unique=False)
+    op.create_index('ix_venue_name_trgm', 'Venue', ['name'], unique=False,
+                    postgresql_using='gin',
+                    postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_artist_name_trgm', 'Artist', ['name'], unique=False,
+                    postgresql_using='gin',
+                    postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    op.drop_index('ix_artist_name_trgm', table_name='Artist')
+    op.drop_index('ix_venue_name_trgm', table_name='Venue')
+    op.drop_index('ix_artist_lower_city_lower_state', table_name='Artist')
+    op.drop_index('ix_venue_lower_city_lower_state', table_name='Venue')
+    op.drop_index('ix_show_start_time', table_name='Show')
+    op.drop_index('ix_show_artist_id_start_time', table_name='Show')
+    op.drop_index('ix_show_venue_id_start_time', table_name='Show')
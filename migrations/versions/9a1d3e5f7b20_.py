@@ -0,0 +1,52 @@
+"""add trigger maintained search vectors to Venue and Artist
+
+Revision ID: 9a1d3e5f7b20
+Revises: 7c2e4b9d1f30
+Create Date: 2022-06-09 14:22:51.604117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '9a1d3e5f7b20'
+down_revision = '7c2e4b9d1f30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE FUNCTION fyyur_search_vector() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := to_tsvector('simple', coalesce(NEW.name, ''));
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    for table in ('Venue', 'Artist'):
+        op.add_column(table, sa.Column(
+            'search_vector', postgresql.TSVECTOR(), nullable=True))
+        op.execute(f"""
+            CREATE TRIGGER {table.lower()}_search_vector
+            BEFORE INSERT OR UPDATE OF name ON "{table}"
+            FOR EACH ROW EXECUTE PROCEDURE fyyur_search_vector()
+        """)
+        op.execute(f"""
+            UPDATE "{table}"
+            SET search_vector = to_tsvector('simple', coalesce(name, ''))
+        """)
+        op.create_index(f'ix_{table.lower()}_search_vector', table,
+                        ['search_vector'], unique=False,
+                        postgresql_using='gin')
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        op.drop_index(f'ix_{table.lower()}_search_vector', table_name=table)
+        op.execute(
+            f'DROP TRIGGER {table.lower()}_search_vector ON "{table}"')
+        op.drop_column(table, 'search_vector')
+    op.execute("DROP FUNCTION fyyur_search_vector()")
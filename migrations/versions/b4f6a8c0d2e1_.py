@@ -0,0 +1,27 @@
+"""widen the Show start_time index to (start_time, id) for keyset paging
+
+Revision ID: b4f6a8c0d2e1
+Revises: 9a1d3e5f7b20
+Create Date: 2022-06-14 09:05:37.281450
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4f6a8c0d2e1'
+down_revision = '9a1d3e5f7b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_show_start_time_id', 'Show',
+                    ['start_time', 'id'], unique=False)
+    op.drop_index('ix_show_start_time', table_name='Show')
+
+
+def downgrade():
+    op.create_index('ix_show_start_time', 'Show',
+                    ['start_time'], unique=False)
+    op.drop_index('ix_show_start_time_id', table_name='Show')
@@ -0,0 +1,44 @@
+"""add materialized upcoming show counters
+
+Revision ID: c5e7f9a1b3d4
+Revises: b4f6a8c0d2e1
+Create Date: 2022-06-21 16:48:12.930225
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e7f9a1b3d4'
+down_revision = 'b4f6a8c0d2e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('Show', sa.Column('counted_as_upcoming', sa.Boolean(),
+                                    server_default=sa.false(), nullable=False))
+    op.add_column('Venue', sa.Column('num_upcoming_shows', sa.Integer(),
+                                     server_default='0', nullable=False))
+    op.add_column('Artist', sa.Column('num_upcoming_shows', sa.Integer(),
+                                      server_default='0', nullable=False))
+    op.create_index('ix_show_counted_as_upcoming_start_time', 'Show',
+                    ['start_time'], unique=False,
+                    postgresql_where=sa.text('counted_as_upcoming'))
+    op.execute('UPDATE "Show" SET counted_as_upcoming = start_time > now()')
+    for table, column in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        op.execute(f'''
+            UPDATE "{table}" SET num_upcoming_shows = (
+                SELECT count(*) FROM "Show"
+                WHERE "Show".{column} = "{table}".id
+                AND "Show".counted_as_upcoming
+            )
+        ''')
+
+
+def downgrade():
+    op.drop_index('ix_show_counted_as_upcoming_start_time', table_name='Show')
+    op.drop_column('Artist', 'num_upcoming_shows')
+    op.drop_column('Venue', 'num_upcoming_shows')
+    op.drop_column('Show', 'counted_as_upcoming')
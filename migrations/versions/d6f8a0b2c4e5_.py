@@ -0,0 +1,86 @@
+"""move comma joined genres into Genre and association tables
+
+Revision ID: d6f8a0b2c4e5
+Revises: c5e7f9a1b3d4
+Create Date: 2022-06-28 11:03:44.517862
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd6f8a0b2c4e5'
+down_revision = 'c5e7f9a1b3d4'
+branch_labels = None
+depends_on = None
+
+GENRES = ['Alternative', 'Classical', 'Country', 'Electronic', 'Folk', 'Funk',
+          'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz', 'Musical Theatre',
+          'Pop', 'Punk', 'R&B', 'Reggae', 'Rock n Roll', 'Soul', 'Other',
+          'Blues']
+
+
+def upgrade():
+    genre = op.create_table('Genre',
+                            sa.Column('id', sa.Integer(), nullable=False),
+                            sa.Column('name', sa.String(
+                                length=120), nullable=False),
+                            sa.PrimaryKeyConstraint('id'),
+                            sa.UniqueConstraint('name')
+                            )
+    for table, column in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        op.create_table(f'{table}Genre',
+                        sa.Column(column, sa.Integer(), nullable=False),
+                        sa.Column('genre_id', sa.Integer(), nullable=False),
+                        sa.ForeignKeyConstraint(
+                            [column], [f'{table}.id'], ondelete='CASCADE'),
+                        sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ),
+                        sa.PrimaryKeyConstraint(column, 'genre_id')
+                        )
+        op.create_index(f'ix_{table.lower()}_genre_genre_id_{column}',
+                        f'{table}Genre', ['genre_id', column], unique=False)
+    op.bulk_insert(genre, [{'name': name} for name in GENRES])
+    for table, column in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        # keep any genre that was stored but is not in the form choices; the
+        # unnest column is aliased, as "name" would clash with the table's
+        op.execute(f'''
+            INSERT INTO "Genre" (name)
+            SELECT DISTINCT trim(genre.genre_name)
+            FROM "{table}"
+            CROSS JOIN LATERAL unnest(string_to_array("{table}".genres, ','))
+                AS genre(genre_name)
+            WHERE trim(genre.genre_name) <> ''
+            ON CONFLICT (name) DO NOTHING
+        ''')
+        op.execute(f'''
+            INSERT INTO "{table}Genre" ({column}, genre_id)
+            SELECT DISTINCT "{table}".id, "Genre".id
+            FROM "{table}"
+            CROSS JOIN LATERAL unnest(string_to_array("{table}".genres, ','))
+                AS genre(genre_name)
+            JOIN "Genre" ON "Genre".name = trim(genre.genre_name)
+        ''')
+        op.drop_column(table, 'genres')
+
+
+def downgrade():
+    op.add_column('Venue', sa.Column('genres', sa.String(), nullable=True))
+    # NOT NULL once filled in, as artists without genres aggregate to NULL
+    op.add_column('Artist', sa.Column('genres', sa.String(
+        length=120), nullable=True))
+    for table, column in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        op.execute(f'''
+            UPDATE "{table}" SET genres = (
+                SELECT string_agg("Genre".name, ',' ORDER BY "Genre".name)
+                FROM "{table}Genre"
+                JOIN "Genre" ON "Genre".id = "{table}Genre".genre_id
+                WHERE "{table}Genre".{column} = "{table}".id
+            )
+        ''')
+        op.drop_index(f'ix_{table.lower()}_genre_genre_id_{column}',
+                      table_name=f'{table}Genre')
+        op.drop_table(f'{table}Genre')
+    op.execute('''UPDATE "Artist" SET genres = '' WHERE genres IS NULL''')
+    op.alter_column('Artist', 'genres', nullable=False)
+    op.drop_table('Genre')
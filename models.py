@@ -1,15 +1,83 @@
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-from initialise_app import *
+from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.ext.associationproxy import association_proxy
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from pool import configure_engine, engine_options
+from routing import configure_replicas, replica_binds, RoutingSQLAlchemy
 
-db = SQLAlchemy(app)
-Migrate(app, db)
+db = RoutingSQLAlchemy()
+
+
+def init_db(app):
+    """Binds `db` to `app` with the pool options and replica binds from its
+    config."""
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(app.config))
+    app.config.setdefault("SQLALCHEMY_BINDS", {}).update(
+        replica_binds(app.config["REPLICA_URLS"]))
+    db.init_app(app)
+    with app.app_context():
+        configure_engine(db.engine, app.config)
+        for replica in configure_replicas(app, db).keys:
+            configure_engine(db.get_engine(app, bind=replica), app.config)
 
 #----------------------------------------------------------------------------#
 # Models.
 #----------------------------------------------------------------------------#
 
 
+class Genre(db.Model):
+    __tablename__ = 'Genre'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+    @classmethod
+    def named(cls, name):
+        """The Genre called `name`, created if it is not stored or pending
+        in this session yet."""
+        for instance in db.session.new:
+            if isinstance(instance, cls) and instance.name == name:
+                return instance
+        with db.session.no_autoflush:
+            return cls.query.filter_by(name=name).one_or_none() or cls(name=name)
+
+
+venue_genres = db.Table(
+    'VenueGenre',
+    db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'),
+              primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'),
+              primary_key=True),
+    db.Index('ix_venue_genre_genre_id_venue_id', 'genre_id', 'venue_id'),
+)
+
+artist_genres = db.Table(
+    'ArtistGenre',
+    db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'),
+              primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'),
+              primary_key=True),
+    db.Index('ix_artist_genre_genre_id_artist_id', 'genre_id', 'artist_id'),
+)
+
+
+def genre_names(association, column, id):
+    """A one-row subquery of `id`'s genre names, comma joined under
+    `genre_names` and keyed by `id`, to outer join into a query that loads
+    an entity with other rows instead of loading `genres` separately."""
+    if db.engine.dialect.name == "postgresql":
+        names = db.func.string_agg(Genre.name, ",")
+    else:
+        names = db.func.group_concat(Genre.name, ",")
+    return db.session.query(column.label("id"), names.label("genre_names"))\
+        .join(Genre, Genre.id == association.c.genre_id)\
+        .filter(column == id).group_by(column).subquery()
+
+
+def split_genre_names(names):
+    return sorted(names.split(",")) if names else []
+
+
 class Venue(db.Model):
     __tablename__ = 'Venue'
 
@@ -21,11 +89,30 @@ class Venue(db.Model):
     phone = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
-    genres = db.Column(db.String())
+    genre_rows = db.relationship("Genre", secondary=venue_genres,
+                                 order_by=Genre.name, lazy="selectin")
+    # genre names, read and assigned as a list of strings
+    genres = association_proxy("genre_rows", "name", creator=Genre.named)
     website_link = db.Column(db.String())
     seeking_talent = db.Column(db.Boolean, nullable=False)
     seeking_description = db.Column(db.String())
     shows = db.relationship("Show", backref="venue_shows", lazy=True)
+    # shows with counted_as_upcoming set, see counters.py
+    num_upcoming_shows = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0")
+    # maintained by a database trigger, see migration 9a1d3e5f7b20
+    search_vector = db.deferred(db.Column(
+        TSVECTOR().with_variant(db.Text(), "sqlite")))
+
+    __table_args__ = (
+        db.Index("ix_venue_search_vector", "search_vector",
+                 postgresql_using="gin"),
+        db.Index("ix_venue_lower_city_lower_state",
+                 db.func.lower(city), db.func.lower(state)),
+        db.Index("ix_venue_name_trgm", name,
+                 postgresql_using="gin",
+                 postgresql_ops={"name": "gin_trgm_ops"}),
+    )
 
 
 class Artist(db.Model):
@@ -36,13 +123,32 @@ class Artist(db.Model):
     city = db.Column(db.String(120), nullable=False)
     state = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120), nullable=False)
+    genre_rows = db.relationship("Genre", secondary=artist_genres,
+                                 order_by=Genre.name, lazy="selectin")
+    # genre names, read and assigned as a list of strings
+    genres = association_proxy("genre_rows", "name", creator=Genre.named)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website_link = db.Column(db.String())
     seeking_venue = db.Column(db.Boolean, nullable=False)
     seeking_description = db.Column(db.String())
     shows = db.relationship("Show", backref="artist_shows", lazy=True)
+    # shows with counted_as_upcoming set, see counters.py
+    num_upcoming_shows = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0")
+    # maintained by a database trigger, see migration 9a1d3e5f7b20
+    search_vector = db.deferred(db.Column(
+        TSVECTOR().with_variant(db.Text(), "sqlite")))
+
+    __table_args__ = (
+        db.Index("ix_artist_search_vector", "search_vector",
+                 postgresql_using="gin"),
+        db.Index("ix_artist_lower_city_lower_state",
+                 db.func.lower(city), db.func.lower(state)),
+        db.Index("ix_artist_name_trgm", name,
+                 postgresql_using="gin",
+                 postgresql_ops={"name": "gin_trgm_ops"}),
+    )
 
 
 class Show(db.Model):
@@ -53,3 +159,45 @@ class Show(db.Model):
     venue_id = db.Column(db.Integer, db.ForeignKey("Venue.id"), nullable=False)
     artist_id = db.Column(db.Integer, db.ForeignKey(
         "Artist.id"), nullable=False)
+    # whether the show is included in its venue's and artist's
+    # num_upcoming_shows; cleared by counters.roll_show_counters
+    counted_as_upcoming = db.Column(
+        db.Boolean, nullable=False, default=False, server_default=db.false())
+
+    __table_args__ = (
+        db.Index("ix_show_venue_id_start_time", venue_id, start_time),
+        db.Index("ix_show_artist_id_start_time", artist_id, start_time),
+        db.Index("ix_show_start_time_id", start_time, id),
+        db.Index("ix_show_counted_as_upcoming_start_time", start_time,
+                 postgresql_where=counted_as_upcoming,
+                 sqlite_where=counted_as_upcoming),
+    )
+
+
+#----------------------------------------------------------------------------#
+# Upcoming show counters.
+#----------------------------------------------------------------------------#
+
+
+def _adjust_upcoming_counts(connection, show, delta):
+    for model, id in ((Venue, show.venue_id), (Artist, show.artist_id)):
+        connection.execute(model.__table__.update()
+                           .where(model.id == id)
+                           .values(num_upcoming_shows=model.num_upcoming_shows + delta))
+
+
+@event.listens_for(Show, "before_insert")
+def _mark_upcoming_show(mapper, connection, show):
+    show.counted_as_upcoming = show.start_time > datetime.now()
+
+
+@event.listens_for(Show, "after_insert")
+def _count_inserted_show(mapper, connection, show):
+    if show.counted_as_upcoming:
+        _adjust_upcoming_counts(connection, show, 1)
+
+
+@event.listens_for(Show, "after_delete")
+def _uncount_deleted_show(mapper, connection, show):
+    if show.counted_as_upcoming:
+        _adjust_upcoming_counts(connection, show, -1)
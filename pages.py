@@ -0,0 +1,106 @@
+from flask import Blueprint, abort, flash, jsonify, render_template, request
+from cache import cached_page, get_page_cache
+from formatting import format_datetime
+from metrics import record_error
+from models import db, artist_genres, venue_genres, Artist, Genre, Venue
+from pagination import keyset_paginate
+from pool import pool_stats
+from recent import get_recent_items
+from routing import read_only
+
+blueprint = Blueprint("pages", __name__)
+
+#----------------------------------------------------------------------------#
+# Filters.
+#----------------------------------------------------------------------------#
+
+
+blueprint.add_app_template_filter(format_datetime, "datetime")
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+
+@blueprint.route('/')
+@read_only
+@cached_page("venues", "artists")
+def index():
+    recent = get_recent_items()
+    return render_template('pages/home.html', venues=recent.get("venues"),
+                           artists=recent.get("artists"))
+
+
+#  Genres
+#  ----------------------------------------------------------------
+
+@blueprint.route('/genres/<genre>')
+@read_only
+@cached_page("venues", "artists")
+def show_genre(genre):
+    genre_row = Genre.query.filter_by(name=genre).one_or_none()
+    if(genre_row is None):
+        flash(f"Genre does not exist: {genre}")
+        abort(404)
+    try:
+        # both lists seek through the (genre_id, entity id) index
+        venues = keyset_paginate(
+            Venue.query.with_entities(Venue.id, Venue.name)
+            .join(venue_genres, venue_genres.c.venue_id == Venue.id)
+            .filter(venue_genres.c.genre_id == genre_row.id),
+            [Venue.id], request.args, prefix="venues_")
+        artists = keyset_paginate(
+            Artist.query.with_entities(Artist.id, Artist.name)
+            .join(artist_genres, artist_genres.c.artist_id == Artist.id)
+            .filter(artist_genres.c.genre_id == genre_row.id),
+            [Artist.id], request.args, prefix="artists_")
+    except ValueError as e:
+        flash(f"An error occurred: {e}")
+        abort(400)
+    return render_template('pages/genre.html', genre=genre_row.name,
+                           venues=venues, artists=artists)
+
+
+#  Cache and pool stats
+#  ----------------------------------------------------------------
+
+@blueprint.route('/cache/stats')
+def cache_stats():
+    cache = get_page_cache()
+    return jsonify(cache.stats() if cache else {"backend": None})
+
+
+@blueprint.route('/pool/stats')
+def pool_stats_view():
+    return jsonify(pool_stats(db.engine))
+
+
+#  Errors
+#  ----------------------------------------------------------------
+
+def is_api_request():
+    return request.path.startswith("/api/")
+
+
+@blueprint.app_errorhandler(400)
+def bad_request_error(error):
+    record_error(400)
+    if is_api_request():
+        return jsonify({"error": error.description}), 400
+    return error
+
+
+@blueprint.app_errorhandler(404)
+def not_found_error(error):
+    record_error(404)
+    if is_api_request():
+        return jsonify({"error": error.description}), 404
+    return render_template('errors/404.html'), 404
+
+
+@blueprint.app_errorhandler(500)
+def server_error(error):
+    record_error(500)
+    if is_api_request():
+        return jsonify({"error": "An error occurred"}), 500
+    return render_template('errors/500.html'), 500
@@ -0,0 +1,98 @@
+from collections import namedtuple
+from datetime import datetime
+
+from flask import current_app
+from models import db
+from streaming import stream_rows
+
+#----------------------------------------------------------------------------#
+# Keyset pagination.
+#----------------------------------------------------------------------------#
+
+Page = namedtuple("Page", ["rows", "page_size", "prev_cursor", "next_cursor"])
+
+
+def encode_cursor(row, keys):
+    values = [getattr(row, key.key) for key in keys]
+    return ",".join(value.isoformat() if isinstance(value, datetime)
+                    else str(value) for value in values)
+
+
+def decode_cursor(cursor, keys):
+    values = cursor.split(",")
+    try:
+        if len(values) != len(keys):
+            raise ValueError
+        return tuple(datetime.fromisoformat(value)
+                     if key.type.python_type is datetime
+                     else key.type.python_type(value)
+                     for key, value in zip(keys, values))
+    except ValueError:
+        raise ValueError(f"invalid cursor: {cursor}")
+
+
+def page_size_from(args, max_page_size=None):
+    page_size = args.get("page_size", current_app.config["PAGE_SIZE"], type=int)
+    return min(max(page_size, 1), max_page_size or current_app.config["MAX_PAGE_SIZE"])
+
+
+class StreamedPage:
+    """A forward keyset page whose rows are fetched through a server-side
+    cursor as they are iterated, once; its cursors are set by the time
+    the iteration is done, so render the pager after the rows."""
+
+    def __init__(self, query, keys, page_size, after):
+        self.query = query
+        self.keys = keys
+        self.page_size = page_size
+        self.after = after
+        self.prev_cursor = None
+        self.next_cursor = None
+
+    @property
+    def rows(self):
+        count, last = 0, None
+        for row in stream_rows(self.query.limit(self.page_size + 1)):
+            if count == self.page_size:
+                self.next_cursor = encode_cursor(last, self.keys)
+                return
+            if count == 0 and self.after:
+                self.prev_cursor = encode_cursor(row, self.keys)
+            yield row
+            count, last = count + 1, row
+
+
+def keyset_paginate(query, keys, args, prefix="", stream=False):
+    """Seeks `query` past the `after` (or before the `before`) cursor in
+    `args`, ordered by `keys`, so each page is one bounded index range scan
+    however deep it is. `keys` must be unique together and selected by the
+    query under their own names. `prefix` namespaces the cursor arguments
+    when one page lists several collections.
+
+    With `stream`, pages may be up to STREAM_MAX_PAGE_SIZE rows and forward
+    pages come back as a StreamedPage.
+    """
+    page_size = page_size_from(
+        args, current_app.config["STREAM_MAX_PAGE_SIZE"] if stream else None)
+    after, before = args.get(prefix + "after"), args.get(prefix + "before")
+    position = db.tuple_(*keys)
+    if stream and not before:
+        if after:
+            query = query.filter(position > decode_cursor(after, keys))
+        return StreamedPage(query.order_by(*keys), keys, page_size, after)
+    if before:
+        rows = query.filter(position < decode_cursor(before, keys))\
+            .order_by(*[db.desc(key) for key in keys])\
+            .limit(page_size + 1).all()
+        has_prev, has_next = len(rows) > page_size, True
+        rows = rows[:page_size][::-1]
+    else:
+        if after:
+            query = query.filter(position > decode_cursor(after, keys))
+        rows = query.order_by(*keys).limit(page_size + 1).all()
+        has_prev, has_next = bool(after), len(rows) > page_size
+        rows = rows[:page_size]
+    return Page(
+        rows, page_size,
+        encode_cursor(rows[0], keys) if rows and has_prev else None,
+        encode_cursor(rows[-1], keys) if rows and has_next else None)
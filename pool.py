@@ -0,0 +1,124 @@
+import time
+from threading import Lock
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+#----------------------------------------------------------------------------#
+# Connection pool.
+#----------------------------------------------------------------------------#
+
+
+class PoolMetrics:
+
+    def __init__(self):
+        self.lock = Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def observe(self, seconds, timed_out=False):
+        with self.lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a
+    connection, including the pre-ping, and how many gave up."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def connect(self):
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            self.metrics.observe(time.perf_counter() - started, timed_out)
+
+    def recreate(self):
+        # the engine swaps in a fresh pool after a disconnect; keep counting
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS built from the DB_* settings.
+
+    In "transaction" mode (PgBouncer transaction pooling) consecutive
+    transactions may run on different server connections, so nothing is set
+    per connection: the statement timeout is applied with SET LOCAL at the
+    start of each transaction instead of as a startup option, and drivers
+    that prepare statements server side are told not to.
+    """
+    url = make_url(config["SQLALCHEMY_DATABASE_URI"])
+    if url.get_backend_name() == "sqlite":
+        return {}
+    options = {
+        "poolclass": TimedQueuePool,
+        "pool_size": config["DB_POOL_SIZE"],
+        "max_overflow": config["DB_MAX_OVERFLOW"],
+        "pool_timeout": config["DB_POOL_TIMEOUT"],
+        "pool_recycle": config["DB_POOL_RECYCLE"],
+        "pool_pre_ping": config["DB_POOL_PRE_PING"],
+        "connect_args": {},
+    }
+    timeout = config["DB_STATEMENT_TIMEOUT_MS"]
+    if config["DB_POOL_MODE"] == "transaction":
+        driver = url.get_driver_name()
+        if driver == "psycopg":
+            options["connect_args"]["prepare_threshold"] = None
+        elif driver == "asyncpg":
+            options["connect_args"]["statement_cache_size"] = 0
+    elif timeout and url.get_driver_name() == "asyncpg":
+        options["connect_args"]["server_settings"] = {
+            "statement_timeout": str(timeout)}
+    elif timeout:
+        options["connect_args"]["options"] = f"-c statement_timeout={timeout}"
+    return options
+
+
+def configure_engine(engine, config):
+    if config["DB_POOL_MODE"] == "transaction" and config["DB_STATEMENT_TIMEOUT_MS"] \
+            and engine.dialect.name == "postgresql":
+        timeout = int(config["DB_STATEMENT_TIMEOUT_MS"])
+
+        @event.listens_for(engine, "begin")
+        def set_statement_timeout(connection):
+            # straight on the DBAPI cursor, which opens the transaction
+            cursor = connection.connection.cursor()
+            cursor.execute(f"SET LOCAL statement_timeout = {timeout}")
+            cursor.close()
+
+
+def pool_stats(engine):
+    pool = engine.pool
+    stats = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        })
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        with metrics.lock:
+            stats.update({
+                "checkouts": metrics.checkouts,
+                "timeouts": metrics.timeouts,
+                "wait_seconds_total": metrics.wait_seconds_total,
+                "wait_seconds_max": metrics.wait_seconds_max,
+            })
+    return stats
@@ -0,0 +1,198 @@
+import time
+from contextlib import contextmanager
+
+from flask import g, has_app_context, request
+from jinja2 import Template
+from sqlalchemy import event, exc
+
+#----------------------------------------------------------------------------#
+# Query counting.
+#----------------------------------------------------------------------------#
+
+
+class QueryCounter:
+    """Records every statement an engine executes while it is active."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.queries = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.queries.append((statement, parameters))
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+    @property
+    def statements(self):
+        return [statement for statement, _ in self.queries]
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+
+@contextmanager
+def assert_max_queries(engine, limit):
+    with QueryCounter(engine) as counter:
+        yield counter
+    if counter.count > limit:
+        raise AssertionError(
+            f"expected at most {limit} queries, got {counter.count}:\n" +
+            "\n".join(counter.statements))
+
+#----------------------------------------------------------------------------#
+# Request profiling.
+#----------------------------------------------------------------------------#
+
+EXPLAIN_PREFIXES = {"postgresql": "EXPLAIN ", "sqlite": "EXPLAIN QUERY PLAN "}
+
+
+class RequestProfile:
+    """What one request spent: every statement with its duration, and the
+    template rendering time net of any queries issued while rendering."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []
+        self.db_seconds = 0.0
+        self.render_seconds = 0.0
+
+    def record(self, engine, statement, parameters, seconds, executemany):
+        self.queries.append((seconds, statement, parameters, engine, executemany))
+        self.db_seconds += seconds
+
+    def slowest(self, limit):
+        return sorted(self.queries, key=lambda query: query[0], reverse=True)[:limit]
+
+    @property
+    def total_seconds(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        return ", ".join([
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{len(self.queries)} queries"',
+            f"render;dur={self.render_seconds * 1000:.1f}",
+            f"total;dur={self.total_seconds * 1000:.1f}",
+        ])
+
+
+def _profile():
+    return g.get("profile") if has_app_context() else None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _profile() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _profile()
+    started = conn.info.get("query_started")
+    if profile is not None and started:
+        profile.record(conn.engine, statement, parameters,
+                       time.perf_counter() - started.pop(), executemany)
+
+
+class ProfiledTemplate(Template):
+
+    def render(self, *args, **kwargs):
+        profile = _profile()
+        if profile is None:
+            return super().render(*args, **kwargs)
+        started, db_seconds = time.perf_counter(), profile.db_seconds
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            # lazy loads while rendering count as database time
+            profile.render_seconds += time.perf_counter() - started - \
+                (profile.db_seconds - db_seconds)
+
+    def generate(self, *args, **kwargs):
+        profile = _profile()
+        chunks = super().generate(*args, **kwargs)
+        if profile is None:
+            yield from chunks
+            return
+        while True:
+            # time each chunk, not the gaps while the server sends them
+            started, db_seconds = time.perf_counter(), profile.db_seconds
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            finally:
+                profile.render_seconds += time.perf_counter() - started - \
+                    (profile.db_seconds - db_seconds)
+            yield chunk
+
+
+def explain(engine, statement, parameters):
+    """The query plan for a SELECT, or None where there is no EXPLAIN."""
+    prefix = EXPLAIN_PREFIXES.get(engine.dialect.name)
+    if prefix is None or not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+        return None
+    try:
+        with engine.connect() as connection:
+            rows = connection.exec_driver_sql(prefix + statement, parameters).all()
+    except exc.DBAPIError as e:
+        return f"(EXPLAIN failed: {e.orig})"
+    return "\n".join(str(row[-1]) for row in rows)
+
+
+def log_slow_request(app, profile, target):
+    lines = [f"slow request {target}: "
+             f"{profile.total_seconds * 1000:.0f} ms total, "
+             f"{len(profile.queries)} queries in {profile.db_seconds * 1000:.0f} ms, "
+             f"render {profile.render_seconds * 1000:.0f} ms"]
+    for seconds, statement, parameters, engine, executemany in \
+            profile.slowest(app.config["PROFILE_SLOWEST"]):
+        lines.append(f"  {seconds * 1000:.1f} ms: {statement} {parameters!r}")
+        plan = None if executemany else explain(engine, statement, parameters)
+        if plan:
+            lines.extend("    " + line for line in plan.splitlines())
+    app.logger.warning("\n".join(lines))
+
+
+def configure_profiling(app, db):
+    """Profiles every request on `db`'s engines, replicas included: logs the
+    ones slower than SLOW_REQUEST_MS with the plans of their slowest
+    statements, and adds a Server-Timing header when SERVER_TIMING is set."""
+    if not app.config["PROFILE_REQUESTS"]:
+        return
+    app.jinja_env.template_class = ProfiledTemplate
+    with app.app_context():
+        engines = [db.engine] + [db.get_engine(app, bind=bind)
+                                 for bind in app.config["SQLALCHEMY_BINDS"]]
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+    @app.before_request
+    def start_profile():
+        g.profile = RequestProfile()
+
+    @app.after_request
+    def finish_profile(response):
+        profile = g.pop("profile", None)
+        if profile is None:
+            return response
+        if app.config["SERVER_TIMING"]:
+            # for a streamed body, only what was spent before it is sent
+            response.headers["Server-Timing"] = profile.server_timing()
+        target = f"{request.method} {request.full_path.rstrip('?')}"
+
+        def log_if_slow():
+            threshold = app.config["SLOW_REQUEST_MS"]
+            if threshold and profile.total_seconds * 1000 >= threshold:
+                log_slow_request(app, profile, target)
+        if response.is_streamed:
+            # a streamed body renders, and queries, as it is sent
+            response.call_on_close(log_if_slow)
+        else:
+            log_if_slow()
+        return response
@@ -0,0 +1,173 @@
+import json
+import os
+import sys
+import time
+from collections import deque, namedtuple
+from threading import Lock, Thread
+
+from flask import current_app
+from sqlalchemy import event, exc
+from cache import redis_client
+from models import db, Artist, Venue
+
+#----------------------------------------------------------------------------#
+# Recently added venues and artists.
+#----------------------------------------------------------------------------#
+
+RecentItem = namedtuple("RecentItem", ["id", "name"])
+
+MODELS = {"venues": Venue, "artists": Artist}
+KINDS = {model: kind for kind, model in MODELS.items()}
+
+
+class RecentItems:
+    """The newest `size` venues and artists, newest first, kept in process
+    memory so the home page needs no query to list them.
+
+    Each list is loaded from the table by `preload`, or on first use, and
+    kept current by
+    session events. Writes made by other processes arrive through
+    `client` (redis pub/sub) when one is given; either way every list is
+    reloaded after `max_age` seconds, so nothing stays stale for longer.
+    """
+
+    def __init__(self, size=10, max_age=60, client=None, channel="fyyur:recent"):
+        self.size = size
+        self.max_age = max_age
+        self.client = client
+        self.channel = channel
+        self.lock = Lock()
+        # kind -> (loaded at, deque of RecentItem); missing when stale
+        self.lists = {}
+        self.listener_pid = None
+
+    def get(self, kind):
+        self._listen()
+        with self.lock:
+            loaded = self.lists.get(kind)
+            if loaded is not None and time.monotonic() - loaded[0] < self.max_age:
+                return list(loaded[1])
+        return self.load(kind)
+
+    def load(self, kind):
+        model = MODELS[kind]
+        items = deque((RecentItem(row.id, row.name) for row in
+                       model.query.with_entities(model.id, model.name)
+                       .order_by(db.desc(model.id)).limit(self.size)),
+                      maxlen=self.size)
+        with self.lock:
+            self.lists[kind] = (time.monotonic(), items)
+            return list(items)
+
+    def preload(self):
+        """Loads every list, so that the first requests do not have to; in
+        gunicorn's master, before the workers are forked with a copy."""
+        try:
+            for kind in MODELS:
+                self.load(kind)
+        except exc.SQLAlchemyError:
+            # the database is down, or has no tables before the first
+            # migration; the first read loads them instead
+            db.session.rollback()
+        finally:
+            db.session.remove()
+
+    def apply(self, changes):
+        """Applies (kind, id, name) changes, name None for a delete, to the
+        loaded lists."""
+        with self.lock:
+            for kind, id, name in changes:
+                loaded = self.lists.get(kind)
+                if loaded is None:
+                    continue
+                items = loaded[1]
+                position = next((index for index, item in enumerate(items)
+                                 if item.id == id), None)
+                if name is None:
+                    # the list is one short now; the next read refills it
+                    if position is not None:
+                        del self.lists[kind]
+                elif position is not None:
+                    items[position] = RecentItem(id, name)
+                elif not items or id > items[0].id:
+                    # the usual case: the newest row pushes out the oldest
+                    items.appendleft(RecentItem(id, name))
+                elif len(items) < self.size or id > items[-1].id:
+                    # broadcasts from two processes can arrive out of order
+                    ordered = sorted(list(items) + [RecentItem(id, name)], reverse=True)
+                    self.lists[kind] = (loaded[0], deque(ordered[:self.size], maxlen=self.size))
+
+    def publish(self, changes):
+        if self.client is None or not changes:
+            return
+        try:
+            self.client.publish(self.channel, json.dumps(
+                {"pid": os.getpid(), "changes": changes}))
+        except:
+            # the write is committed; other processes catch up on max_age
+            print(sys.exc_info())
+
+    def _listen(self):
+        # started by the first read in each process, so in every gunicorn
+        # worker rather than in the master that preloads the app
+        if self.client is None or self.listener_pid == os.getpid():
+            return
+        self.listener_pid = os.getpid()
+        Thread(target=self._receive, name="recent-items", daemon=True).start()
+
+    def _receive(self):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                # anything published while unsubscribed was missed
+                with self.lock:
+                    self.lists.clear()
+                for message in pubsub.listen():
+                    data = json.loads(message["data"])
+                    if data["pid"] != os.getpid():
+                        self.apply([tuple(change) for change in data["changes"]])
+            except:
+                print(sys.exc_info())
+                time.sleep(1)
+
+
+def get_recent_items():
+    extensions = current_app.extensions
+    if "recent_items" not in extensions:
+        config = current_app.config
+        client = None
+        if config["RECENT_ITEMS_BROADCAST"] == "redis":
+            client = redis_client("RECENT_ITEMS_BROADCAST")
+        extensions["recent_items"] = RecentItems(
+            config["RECENT_ITEMS_SIZE"], config["RECENT_ITEMS_MAX_AGE"], client)
+    return extensions["recent_items"]
+
+#----------------------------------------------------------------------------#
+# List maintenance.
+#----------------------------------------------------------------------------#
+
+
+@event.listens_for(db.session, "after_flush")
+def _collect_recent_changes(session, flush_context):
+    changes = session.info.setdefault("recent_changes", [])
+    for instance in session.new | session.dirty:
+        if isinstance(instance, (Venue, Artist)):
+            changes.append((KINDS[type(instance)], instance.id, instance.name))
+    for instance in session.deleted:
+        if isinstance(instance, (Venue, Artist)):
+            changes.append((KINDS[type(instance)], instance.id, None))
+
+
+@event.listens_for(db.session, "after_commit")
+def _apply_recent_changes(session):
+    changes = session.info.pop("recent_changes", [])
+    if changes:
+        recent = get_recent_items()
+        recent.apply(changes)
+        recent.publish(changes)
+
+
+@event.listens_for(db.session, "after_soft_rollback")
+def _discard_recent_changes(session, previous_transaction):
+    session.info.pop("recent_changes", None)
@@ -0,0 +1,109 @@
+import time
+from functools import wraps
+from threading import Lock
+
+from flask import current_app, g, has_app_context, session
+from flask_sqlalchemy import get_state, SQLAlchemy, SignallingSession
+from sqlalchemy import event, orm
+
+#----------------------------------------------------------------------------#
+# Read replicas.
+#----------------------------------------------------------------------------#
+
+
+class ReplicaSet:
+    """Round-robins over the replica bind keys, skipping any replica whose
+    last connection failed within `retry_seconds`."""
+
+    def __init__(self, keys, retry_seconds=30):
+        self.keys = list(keys)
+        self.retry_seconds = retry_seconds
+        self.down_until = {}
+        self.next = 0
+        self.lock = Lock()
+
+    def choose(self):
+        now = time.monotonic()
+        with self.lock:
+            for _ in range(len(self.keys)):
+                key = self.keys[self.next % len(self.keys)]
+                self.next += 1
+                if self.down_until.get(key, 0) <= now:
+                    return key
+        return None
+
+    def mark_down(self, key):
+        with self.lock:
+            self.down_until[key] = time.monotonic() + self.retry_seconds
+
+
+def replica_binds(urls):
+    return {f"replica_{number}": url for number, url in enumerate(urls)}
+
+
+class RoutingSession(SignallingSession):
+    """Sends a read-only request's queries to the replica picked for it and
+    everything else, including any flush, to the primary."""
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if has_app_context() and g.get("replica") and not self._flushing:
+            return get_state(self.app).db.get_engine(self.app, bind=g.replica)
+        return super().get_bind(mapper, clause)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _wrote(*args):
+    if has_app_context():
+        g.wrote = True
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+def configure_replicas(app, db):
+    """Builds the ReplicaSet for the REPLICA_URLS binds and marks a replica
+    down whenever connecting to it fails."""
+    replicas = ReplicaSet(replica_binds(app.config["REPLICA_URLS"]),
+                          app.config["REPLICA_RETRY_SECONDS"])
+    app.extensions["replicas"] = replicas
+    for key in replicas.keys:
+        engine = db.get_engine(app, bind=key)
+
+        @event.listens_for(engine, "handle_error")
+        def replica_failed(context, key=key):
+            if context.is_disconnect or context.connection is None:
+                replicas.mark_down(key)
+
+    @app.after_request
+    def stick_to_primary(response):
+        # the client that just wrote reads its own writes from the primary
+        # until the replicas have caught up
+        if g.get("wrote"):
+            session["read_primary_until"] = \
+                time.time() + app.config["REPLICA_STICKY_SECONDS"]
+        return response
+    return replicas
+
+
+def read_only(view):
+    """Runs the view's queries on a replica, unless there is none healthy or
+    this client wrote in the last REPLICA_STICKY_SECONDS."""
+    @wraps(view)
+    def wrapper(**kwargs):
+        replicas = current_app.extensions.get("replicas")
+        if replicas and replicas.keys \
+                and session.get("read_primary_until", 0) < time.time():
+            g.replica = replicas.choose()
+        return view(**kwargs)
+    return wrapper
+
+
+def use_primary():
+    """Sends the rest of a read-only request's queries to the primary, for
+    results that outlive the request: a lagging replica's rows would be
+    cached after the write that invalidated them."""
+    if has_app_context():
+        g.pop("replica", None)
@@ -0,0 +1,125 @@
+from bisect import bisect_right, insort
+from datetime import timedelta
+
+from flask import current_app
+import bulk
+from cache import invalidate_pages
+from models import db, Show
+
+#----------------------------------------------------------------------------#
+# Show scheduling.
+#----------------------------------------------------------------------------#
+
+
+class IntervalIndex:
+    """Sorted start times per venue or artist. Two shows clash when they
+    start less than `window` apart, so a new show is checked with one
+    bisection into its venue's or artist's list."""
+
+    def __init__(self, window):
+        self.window = window
+        self.starts = {}
+
+    def add(self, key, start):
+        insort(self.starts.setdefault(key, []), start)
+
+    def clash(self, key, start):
+        """The booked start time closest after `start - window`, if it is
+        within the window; None when `key` is free."""
+        starts = self.starts.get(key, ())
+        index = bisect_right(starts, start - self.window)
+        if index < len(starts) and starts[index] < start + self.window:
+            return starts[index]
+        return None
+
+
+def booking_window(minutes=None):
+    if minutes is None:
+        minutes = current_app.config["SHOW_CONFLICT_WINDOW_MINUTES"]
+    # a negative window would let every show clash with nothing
+    if minutes < 0:
+        raise ValueError("the booking window cannot be negative")
+    return timedelta(minutes=minutes)
+
+
+def _booked(column, ids, earliest, latest, window):
+    """An IntervalIndex of the existing shows of `ids` near the batch, read
+    with one range scan of the (id, start_time) index."""
+    index = IntervalIndex(window)
+    if not ids:
+        return index
+    for key, start in db.session.query(column, Show.start_time).filter(
+            column.in_(ids),
+            Show.start_time > earliest - window,
+            Show.start_time < latest + window):
+        index.add(key, start)
+    return index
+
+
+def unbooked(values, window, report):
+    """Drops shows whose venue or artist already has a show, or an earlier
+    row of the batch, starting within `window` of theirs."""
+    if not values:
+        return []
+    starts = [value["start_time"] for _, value in values]
+    earliest, latest = min(starts), max(starts)
+    indexes = {
+        column: _booked(getattr(Show, column), {value[column] for _, value in values},
+                        earliest, latest, window)
+        for column in ("venue_id", "artist_id")
+    }
+    accepted = []
+    for line, value in values:
+        errors = {}
+        for column, index in indexes.items():
+            clash = index.clash(value[column], value["start_time"])
+            if clash is not None:
+                kind = column.split("_")[0]
+                errors[column] = [f"{kind} {value[column]} already has a show at {clash}"]
+        if errors:
+            report.errors.append((line, errors))
+            continue
+        for column, index in indexes.items():
+            index.add(value[column], value["start_time"])
+        accepted.append((line, value))
+    return accepted
+
+
+def validate_rows(rows, report):
+    """Runs each row through ShowForm; returns (line, values) for the valid
+    ones, numbered from 1."""
+    _, form_class, fields = bulk.ENTITIES["shows"]
+    values = []
+    for line, row in enumerate(rows, 1):
+        cleaned, errors = bulk.validate(form_class, fields, row)
+        if errors:
+            report.errors.append((line, errors))
+        else:
+            values.append((line, cleaned))
+    return values
+
+
+def schedule_shows(values, window=None, strict=False, report=None):
+    """Books (line, values) shows in one transaction, rejecting the ones
+    whose venue or artist is missing or double booked. With `strict`,
+    nothing is booked unless every show is accepted.
+
+    The venue and artist rows are locked while the batch is checked, so
+    concurrent batches for the same venues or artists run one at a time
+    (on PostgreSQL; SQLite serializes writers anyway).
+    """
+    report = report or bulk.ImportReport()
+    window = booking_window() if window is None else window
+    values = bulk.existing_references(values, report, lock=True)
+    values = unbooked(values, window, report)
+    report.errors.sort(key=lambda error: error[0])
+    if strict and report.errors:
+        db.session.rollback()
+        return report
+    bulk.insert_shows(values)
+    db.session.commit()
+    report.imported = len(values)
+    if values:
+        invalidate_pages("shows", *{f"venue:{value['venue_id']}" for _, value in values},
+                         *{f"artist:{value['artist_id']}" for _, value in values})
+    return report
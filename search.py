@@ -0,0 +1,252 @@
+import re
+from bisect import bisect_left
+from collections import namedtuple
+from threading import Lock
+
+from flask import current_app
+from sqlalchemy import event
+from models import db, Venue, Artist
+
+#----------------------------------------------------------------------------#
+# Search backends.
+#----------------------------------------------------------------------------#
+
+SearchPage = namedtuple("SearchPage", ["ids", "total"])
+
+TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return TOKEN.findall((text or "").lower())
+
+
+class PostgresSearch:
+    """Ranked prefix search over the trigger-maintained `search_vector`
+    columns, OR'd with a trigram-indexed substring match on `name`."""
+
+    def _query(self, terms):
+        # 'the:* & roxy:*' -- every term must prefix-match a lexeme
+        return db.func.to_tsquery(
+            "simple", " & ".join(f"{term}:*" for term in terms))
+
+    def match(self, model, term):
+        terms = tokenize(term)
+        if not terms:
+            return db.true()
+        return db.or_(
+            model.search_vector.op("@@")(self._query(terms)),
+            model.name.ilike(f"%{term}%"))
+
+    def ranking(self, model, term):
+        terms = tokenize(term)
+        if not terms:
+            return [model.id]
+        return [db.desc(db.func.ts_rank(model.search_vector, self._query(terms))),
+                model.id]
+
+    def search(self, model, term, page, per_page):
+        query = model.query.with_entities(model.id).filter(
+            self.match(model, term))
+        total = query.count()
+        query = query.order_by(*self.ranking(model, term))
+        ids = [row.id for row in
+               query.offset((page - 1) * per_page).limit(per_page)]
+        return SearchPage(ids, total)
+
+
+class InMemorySearch:
+    """Inverted index of name tokens kept in process memory.
+
+    Used when the database has no full text support (SQLite in tests). The
+    index is built from the table on first use and kept current by session
+    events, so it only sees writes made by this process.
+
+    Threaded workers search while commits apply changes, so the index is
+    built, changed and read under `lock`.
+    """
+
+    def __init__(self):
+        self.indexes = {}
+        self.lock = Lock()
+
+    def _index(self, model):
+        index = self.indexes.get(model)
+        if index is None:
+            with self.lock:
+                # a commit waits for the build, then applies its changes
+                # on top of what the build read
+                if model not in self.indexes:
+                    index = _InvertedIndex()
+                    for row in model.query.with_entities(model.id, model.name):
+                        index.add(row.id, row.name)
+                    self.indexes[model] = index
+                index = self.indexes[model]
+        return index
+
+    def _search(self, model, term):
+        index = self._index(model)
+        with self.lock:
+            return index.search(term)
+
+    def apply(self, changes):
+        with self.lock:
+            for model, id, name in changes:
+                if model not in self.indexes:
+                    continue
+                self.indexes[model].remove(id)
+                if name is not None:
+                    self.indexes[model].add(id, name)
+
+    def match(self, model, term):
+        if not tokenize(term):
+            return db.true()
+        return model.id.in_(self._search(model, term))
+
+    def search(self, model, term, page, per_page):
+        if not tokenize(term):
+            query = model.query.with_entities(model.id).order_by(model.id)
+            ids = [row.id for row in
+                   query.offset((page - 1) * per_page).limit(per_page)]
+            return SearchPage(ids, query.count())
+        ranked = self._search(model, term)
+        start = (page - 1) * per_page
+        return SearchPage(ranked[start:start + per_page], len(ranked))
+
+
+class _InvertedIndex:
+    """Token postings for prefix matches plus trigram postings for substring
+    matches, mirroring the tsvector and pg_trgm indexes."""
+
+    def __init__(self):
+        self.names = {}
+        self.token_sets = {}
+        self.postings = {}
+        self.tokens = []
+        self.trigrams = {}
+
+    def add(self, id, name):
+        name = (name or "").lower()
+        self.names[id] = name
+        self.token_sets[id] = set(tokenize(name))
+        for token in self.token_sets[id]:
+            if token not in self.postings:
+                self.postings[token] = set()
+                self.tokens.insert(bisect_left(self.tokens, token), token)
+            self.postings[token].add(id)
+        for gram in _trigrams(name):
+            self.trigrams.setdefault(gram, set()).add(id)
+
+    def remove(self, id):
+        if id not in self.names:
+            return
+        for token in self.token_sets.pop(id):
+            self.postings[token].discard(id)
+        for gram in _trigrams(self.names.pop(id)):
+            self.trigrams[gram].discard(id)
+
+    def _prefixed(self, term):
+        ids = set()
+        position = bisect_left(self.tokens, term)
+        while position < len(self.tokens) and \
+                self.tokens[position].startswith(term):
+            ids |= self.postings[self.tokens[position]]
+            position += 1
+        return ids
+
+    def _containing(self, needle):
+        grams = _trigrams(needle)
+        if not grams:
+            return {id for id, name in self.names.items() if needle in name}
+        postings = sorted((self.trigrams.get(gram, set()) for gram in grams),
+                          key=len)
+        candidates = postings[0].intersection(*postings[1:])
+        return {id for id in candidates if needle in self.names[id]}
+
+    def search(self, term):
+        terms = tokenize(term)
+        prefixed = set.intersection(*[self._prefixed(t) for t in terms])
+        # exact token hits rank above prefix hits, as with ts_rank
+        exact = set(terms)
+        ranked = sorted(prefixed, key=lambda id: (
+            -len(exact & self.token_sets[id]), id))
+        ranked += sorted(self._containing(term.lower()) - prefixed)
+        return ranked
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def get_search_backend():
+    extensions = current_app.extensions
+    if "search" not in extensions:
+        backend = current_app.config.get("SEARCH_BACKEND", "auto")
+        if backend == "auto":
+            backend = "postgres" if db.engine.dialect.name == "postgresql" \
+                else "memory"
+        extensions["search"] = PostgresSearch() if backend == "postgres" \
+            else InMemorySearch()
+    return extensions["search"]
+
+
+def search_entities(model, term, page, per_page):
+    """Returns a page of `model` ids matching a search box entry; "city,
+    state" entries match the location exactly, anything else goes to the
+    configured backend."""
+    if "," in term:
+        city, state = [string.strip() for string in term.split(",", 1)]
+        query = model.query.with_entities(model.id).filter(
+            db.func.lower(model.city) == city.lower(),
+            db.func.lower(model.state) == state.lower())
+        ids = [row.id for row in query.order_by(model.id)
+               .offset((page - 1) * per_page).limit(per_page)]
+        return SearchPage(ids, query.count())
+    return get_search_backend().search(model, term, page, per_page)
+
+
+def search_results(model, search_term, page):
+    """The search results page for `model`: the ranked id page resolved to
+    names and upcoming show counts in one query."""
+    page = max(page, 1)
+    per_page = current_app.config["SEARCH_PAGE_SIZE"]
+    ids, total = search_entities(model, search_term, page, per_page)
+    rows = model.query.with_entities(
+        model.id, model.name, model.num_upcoming_shows)\
+        .filter(model.id.in_(ids)).all()
+    # keep the backend's ranking
+    by_id = {row.id: row._asdict() for row in rows}
+    return {
+        "count": total,
+        "data": [by_id[id] for id in ids if id in by_id],
+        "page": page,
+        "has_prev": page > 1,
+        "has_next": page * per_page < total
+    }
+
+#----------------------------------------------------------------------------#
+# Index maintenance.
+#----------------------------------------------------------------------------#
+
+
+@event.listens_for(db.session, "after_flush")
+def _collect_search_changes(session, flush_context):
+    changes = session.info.setdefault("search_changes", [])
+    for instance in session.new | session.dirty:
+        if isinstance(instance, (Venue, Artist)):
+            changes.append((type(instance), instance.id, instance.name))
+    for instance in session.deleted:
+        if isinstance(instance, (Venue, Artist)):
+            changes.append((type(instance), instance.id, None))
+
+
+@event.listens_for(db.session, "after_commit")
+def _apply_search_changes(session):
+    changes = session.info.pop("search_changes", [])
+    backend = current_app.extensions.get("search")
+    if isinstance(backend, InMemorySearch):
+        backend.apply(changes)
+
+
+@event.listens_for(db.session, "after_soft_rollback")
+def _discard_search_changes(session, previous_transaction):
+    session.info.pop("search_changes", None)
@@ -0,0 +1,207 @@
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate, islice
+
+from counters import rebuild_show_counters
+from forms import Genres, VenueForm
+from models import db, artist_genres, venue_genres, Artist, Genre, Show, Venue
+
+#----------------------------------------------------------------------------#
+# Synthetic data.
+#----------------------------------------------------------------------------#
+
+# venues, artists, shows
+SCALES = {
+    "small": (50, 100, 1000),
+    "medium": (2000, 5000, 100000),
+    "large": (100000, 200000, 10000000),
+}
+
+BATCH_SIZE = 10000
+
+# (city, state, relative weight), roughly by the size of the music scene
+CITIES = [
+    ("New York", "NY", 30), ("Los Angeles", "CA", 26), ("Nashville", "TN", 18),
+    ("Chicago", "IL", 16), ("Austin", "TX", 14), ("San Francisco", "CA", 12),
+    ("Atlanta", "GA", 10), ("Seattle", "WA", 9), ("New Orleans", "LA", 9),
+    ("Boston", "MA", 7), ("Denver", "CO", 7), ("Philadelphia", "PA", 7),
+    ("Portland", "OR", 6), ("Miami", "FL", 6), ("Detroit", "MI", 5),
+    ("Minneapolis", "MN", 5), ("Houston", "TX", 5), ("Las Vegas", "NV", 5),
+    ("Memphis", "TN", 4), ("Washington", "DC", 4), ("San Diego", "CA", 4),
+    ("Dallas", "TX", 4), ("Phoenix", "AZ", 3), ("Kansas City", "MO", 3),
+    ("Pittsburgh", "PA", 3), ("Baltimore", "MD", 3), ("St. Louis", "MO", 3),
+    ("Salt Lake City", "UT", 2), ("Louisville", "KY", 2), ("Athens", "GA", 2),
+    ("Asheville", "NC", 2), ("Omaha", "NE", 1), ("Boise", "ID", 1),
+    ("Burlington", "VT", 1), ("Anchorage", "AK", 1), ("Honolulu", "HI", 1),
+]
+
+NAME_WORDS = [
+    "Blue", "Red", "Velvet", "Silver", "Golden", "Electric", "Midnight",
+    "Crimson", "Neon", "Wild", "Lucky", "Broken", "Little", "Iron", "Echo",
+    "Paper", "Rusty", "Copper", "Hollow", "Northern", "Lonesome", "Static",
+]
+VENUE_NOUNS = ["Room", "Hall", "Lounge", "Tavern", "Theatre", "Club", "Cellar",
+               "Ballroom", "Saloon", "Garden", "Warehouse", "Stage"]
+ARTIST_NOUNS = ["Foxes", "Rivers", "Kings", "Ghosts", "Wolves", "Sparrows",
+                "Brothers", "Machines", "Lights", "Horses", "Tides", "Saints"]
+# most played first; genres not listed come last
+GENRE_POPULARITY = [
+    "Rock n Roll", "Pop", "Hip-Hop", "Alternative", "R&B", "Country", "Jazz",
+    "Electronic", "Folk", "Blues", "Punk", "Soul", "Heavy Metal", "Funk",
+    "Reggae", "Classical", "Instrumental", "Musical Theatre", "Other",
+]
+STREETS = ["Main St", "Broadway", "Oak Ave", "Elm St", "Market St",
+           "Music Row", "2nd Ave", "Sunset Blvd", "Bourbon St", "Pine St"]
+
+
+def genre_names():
+    """The form's genres, most popular first."""
+    names = [genre.choice_tuple()[0] for genre in Genres]
+    return sorted(names, key=lambda name: GENRE_POPULARITY.index(name)
+                  if name in GENRE_POPULARITY else len(GENRE_POPULARITY))
+
+
+def state_choices():
+    return [value for value, _ in VenueForm.state.kwargs["choices"]]
+
+
+def zipf_weights(count, exponent=1.0):
+    """Weights for `count` items where the n-th is 1/n^exponent as likely as
+    the first: a few busy venues and headliners, and a long tail."""
+    return [1 / (rank + 1) ** exponent for rank in range(count)]
+
+
+class Generator:
+    """Random but reproducible rows: the same seed gives the same data."""
+
+    def __init__(self, seed=0):
+        self.random = random.Random(seed)
+        self.genres = genre_names()
+        self.genre_weights = zipf_weights(len(self.genres), 0.8)
+        states = set(state_choices())
+        self.cities = [(city, state) for city, state, _ in CITIES if state in states]
+        self.city_weights = [weight for city, state, weight in CITIES if state in states]
+
+    def city(self):
+        return self.random.choices(self.cities, self.city_weights)[0]
+
+    def pick_genres(self):
+        count = self.random.choice((1, 1, 2, 2, 3))
+        return set(self.random.choices(self.genres, self.genre_weights, k=count))
+
+    def phone(self):
+        # ten digits, as VenueForm and ArtistForm accept
+        return f"{self.random.randint(200, 999)}{self.random.randint(200, 999)}" \
+            f"{self.random.randint(0, 9999):04}"
+
+    def name(self, nouns, number):
+        words = self.random.sample(NAME_WORDS, 2) if self.random.random() < 0.3 \
+            else [self.random.choice(NAME_WORDS)]
+        return f"The {' '.join(words)} {self.random.choice(nouns)} {number}"
+
+    def venue(self, number):
+        city, state = self.city()
+        seeking = self.random.random() < 0.3
+        return {
+            "name": self.name(VENUE_NOUNS, number), "city": city, "state": state,
+            "address": f"{self.random.randint(1, 9999)} {self.random.choice(STREETS)}",
+            "phone": self.phone(), "seeking_talent": seeking,
+            "seeking_description": "Looking for local acts" if seeking else None,
+            "facebook_link": f"https://www.facebook.com/venue{number}",
+            "website_link": f"https://venue{number}.example.com",
+        }
+
+    def artist(self, number):
+        city, state = self.city()
+        seeking = self.random.random() < 0.4
+        return {
+            "name": self.name(ARTIST_NOUNS, number), "city": city, "state": state,
+            "phone": self.phone(), "seeking_venue": seeking,
+            "seeking_description": "Booking our next tour" if seeking else None,
+            "facebook_link": f"https://www.facebook.com/artist{number}",
+            "website_link": f"https://artist{number}.example.com",
+        }
+
+    def shows(self, count, venue_ids, artist_ids, now):
+        """Shows from a year back to a year ahead at evening hours; busy
+        venues and popular artists get most of them."""
+        # accumulated once rather than by every choices() call
+        venue_weights = list(accumulate(zipf_weights(len(venue_ids), 0.7)))
+        artist_weights = list(accumulate(zipf_weights(len(artist_ids), 0.9)))
+        # shuffled so the busy ones are not always the lowest ids
+        venue_ids, artist_ids = list(venue_ids), list(artist_ids)
+        self.random.shuffle(venue_ids)
+        self.random.shuffle(artist_ids)
+        start = now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=365)
+        remaining = count
+        while remaining:
+            batch = min(remaining, BATCH_SIZE)
+            remaining -= batch
+            venues = self.random.choices(venue_ids, cum_weights=venue_weights, k=batch)
+            artists = self.random.choices(artist_ids, cum_weights=artist_weights, k=batch)
+            for venue_id, artist_id in zip(venues, artists):
+                yield {
+                    "venue_id": venue_id, "artist_id": artist_id,
+                    "start_time": start + timedelta(
+                        days=self.random.randrange(730),
+                        hours=self.random.choice((18, 19, 20, 20, 21, 21, 22)),
+                        minutes=self.random.choice((0, 0, 30))),
+                }
+
+
+def _batches(rows):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, BATCH_SIZE))
+        if not batch:
+            return
+        yield batch
+
+
+def _insert(model, rows):
+    """Inserts `rows` and returns the new ids, in insertion order."""
+    last_id = db.session.query(db.func.max(model.id)).scalar() or 0
+    for batch in _batches(rows):
+        db.session.execute(model.__table__.insert(), batch)
+        db.session.commit()
+    return [id for id, in db.session.query(model.id)
+            .filter(model.id > last_id).order_by(model.id)]
+
+
+def _insert_genres(table, column, ids, generator, genre_ids):
+    rows = ({column: id, "genre_id": genre_ids[name]}
+            for id in ids for name in generator.pick_genres())
+    for batch in _batches(rows):
+        db.session.execute(table.insert(), batch)
+        db.session.commit()
+
+
+def generate(venues, artists, shows, seed=0, now=None, echo=print):
+    """Adds `venues`, `artists` and `shows` synthetic rows through bulk
+    inserts, then recounts the upcoming show counters. Search vectors are
+    filled in by the PostgreSQL trigger; restart servers using the in-memory
+    search index so it picks the new rows up."""
+    now = now or datetime.now()
+    generator = Generator(seed)
+    db.session.add_all([Genre.named(name) for name in generator.genres])
+    db.session.commit()
+    genre_ids = dict(db.session.query(Genre.name, Genre.id))
+
+    started = time.perf_counter()
+    venue_ids = _insert(Venue, (generator.venue(number) for number in range(venues)))
+    _insert_genres(venue_genres, "venue_id", venue_ids, generator, genre_ids)
+    artist_ids = _insert(Artist, (generator.artist(number) for number in range(artists)))
+    _insert_genres(artist_genres, "artist_id", artist_ids, generator, genre_ids)
+    echo(f"{venues} venues and {artists} artists in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    inserted = 0
+    for batch in _batches(generator.shows(shows, venue_ids, artist_ids, now)):
+        db.session.execute(Show.__table__.insert(), batch)
+        db.session.commit()
+        inserted += len(batch)
+        if inserted % (BATCH_SIZE * 100) == 0:
+            echo(f"  {inserted} shows")
+    echo(f"{shows} shows in {time.perf_counter() - started:.1f}s")
+    rebuild_show_counters(now)
@@ -0,0 +1,145 @@
+from datetime import datetime, timedelta
+
+from flask import (Blueprint, abort, current_app, flash, redirect, render_template,
+                   request, url_for)
+from cache import cached_page
+from forms import ShowForm
+from models import db, Artist, Show, Venue
+from pagination import keyset_paginate
+from routing import read_only
+from scheduling import schedule_shows
+from search import get_search_backend
+from streaming import stream_template
+
+blueprint = Blueprint("shows", __name__)
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+def show_page(args, stream=False):
+    return keyset_paginate(Show.query.with_entities(
+        Show.id,
+        Show.venue_id,
+        Venue.name.label("venue_name"),
+        Show.artist_id,
+        Artist.name.label("artist_name"),
+        Artist.image_link.label("artist_image_link"),
+        Show.start_time
+    ).join(Artist).join(Venue), [Show.start_time, Show.id], args, stream=stream)
+
+
+@blueprint.route('/shows')
+@read_only
+@cached_page("shows", "venues", "artists")
+def shows():
+    data = []
+    stream = current_app.config["STREAM_LISTINGS"]
+    try:
+        page = show_page(request.args, stream)
+        # a streamed page's rows are only read as the template renders
+        data = page.rows if stream else [show._asdict() for show in page.rows]
+    except ValueError as e:
+        flash(f"An error occurred: {e}")
+        abort(400)
+    except:
+        flash("An error occurred")
+        abort(500)
+    render = stream_template if stream else render_template
+    return render('pages/shows.html', shows=data, page=page)
+
+
+@blueprint.route('/shows/create')
+def create_shows():
+    # renders form. do not touch.
+    form = ShowForm()
+    return render_template('forms/new_show.html', form=form)
+
+
+@blueprint.route('/shows/create', methods=['POST'])
+def create_show_submission():
+    error = False
+    form = ShowForm()
+    if form.validate_on_submit():
+        try:
+            report = schedule_shows([(1, {
+                "start_time": form.start_time.data,
+                "artist_id": form.artist_id.data,
+                "venue_id": form.venue_id.data
+            })])
+        except:
+            error = True
+            db.session.rollback()
+            flash('An error occurred. Show could not be listed.')
+        finally:
+            db.session.close()
+        if error:
+            abort(500)
+        if report.errors:
+            for _, errors in report.errors:
+                for messages in errors.values():
+                    flash(messages[0])
+            return render_template('forms/new_show.html', form=form)
+        flash('Show was successfully listed!')
+    else:
+        flash("Some fields failed validation")
+        return render_template('forms/new_show.html', form=form)
+    return redirect(url_for("pages.index"))
+
+
+def show_search_page(search_term, args):
+    date_query = None
+    if("/" in search_term):
+        [day, month, year] = [int(string.strip())
+                              for string in search_term.split("/")]
+        date = datetime(year, month, day)
+        next_date = date + timedelta(days=1)
+        date_query = db.and_(
+            Show.start_time >= date,
+            Show.start_time < next_date
+        )
+    backend = get_search_backend()
+    # resolve the name matches through each table's own index
+    # first, so Show is filtered on its indexed foreign keys
+    filters = [
+        Show.artist_id.in_(Artist.query.with_entities(Artist.id)
+                           .filter(backend.match(Artist, search_term))),
+        Show.venue_id.in_(Venue.query.with_entities(Venue.id)
+                          .filter(backend.match(Venue, search_term)))
+    ]
+    if date_query is not None:
+        filters.append(date_query)
+    show_query = Show.query\
+        .with_entities(
+            Show.id,
+            Show.artist_id,
+            Show.venue_id,
+            Artist.image_link.label("artist_image_link"),
+            Artist.name.label("artist_name"),
+            Venue.name.label("venue_name"),
+            Show.start_time
+        )\
+        .join(Artist)\
+        .join(Venue)\
+        .filter(db.or_(*filters))
+    return keyset_paginate(show_query, [Show.start_time, Show.id], args)
+
+
+@blueprint.route("/shows/search", methods=['GET', 'POST'])
+@read_only
+def search_shows():
+    shows = []
+    page = None
+    search_term = request.form.get("search_term", "")
+    if(request.method == "POST"):
+        try:
+            page = show_search_page(search_term, request.form)
+            shows = [show._asdict() for show in page.rows]
+        except:
+            flash("An error ocurred")
+            abort(500)
+    return render_template("pages/show.html", shows=shows, search_term=search_term, page=page)
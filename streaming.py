@@ -0,0 +1,48 @@
+from flask import Response, current_app, g, stream_with_context
+
+#----------------------------------------------------------------------------#
+# Streaming responses.
+#----------------------------------------------------------------------------#
+
+
+def stream_rows(query, batch_size=None):
+    """Iterates `query` through a server-side cursor, fetching
+    `batch_size` rows (STREAM_BATCH_SIZE by default) at a time."""
+    batch_size = batch_size or current_app.config["STREAM_BATCH_SIZE"]
+    return query.execution_options(stream_results=True).yield_per(batch_size)
+
+
+def _buffered(chunks, size):
+    # Jinja yields a fragment per output expression; send fewer, larger writes
+    buffer, buffered = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= size:
+            yield "".join(buffer)
+            buffer, buffered = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def _with_globals(chunks, values):
+    # stream_with_context pushes a new app context, and with it an empty `g`;
+    # carry over the request's profile, replica and cache state
+    g.__dict__.update(values)
+    yield from chunks
+
+
+def stream_template(template_name, **context):
+    """Like `render_template`, but the page is sent while it renders: the
+    layout goes out before the rows of a lazily evaluated query are
+    fetched, and only a chunk is held in memory at a time.
+
+    The status and headers are sent first, so an error while rendering
+    cuts the page short instead of turning into a 500 page.
+    """
+    app = current_app._get_current_object()
+    app.update_template_context(context)
+    template = app.jinja_env.get_or_select_template(template_name)
+    chunks = _buffered(template.generate(context), app.config["STREAM_BUFFER_BYTES"])
+    chunks = _with_globals(chunks, dict(g.__dict__))
+    return Response(stream_with_context(chunks), mimetype="text/html")
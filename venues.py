@@ -0,0 +1,235 @@
+import sys
+from itertools import groupby
+
+from flask import (Blueprint, abort, current_app, flash, jsonify, redirect,
+                   render_template, request, url_for)
+from cache import cached_page, invalidate_pages, schedule_detail, ShowSchedule
+from forms import VenueForm
+from models import db, genre_names, split_genre_names, venue_genres, Artist, Show, Venue
+from routing import read_only
+from search import search_results
+from streaming import stream_rows, stream_template
+
+blueprint = Blueprint("venues", __name__)
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+
+#  Venues
+#  ----------------------------------------------------------------
+
+def venue_rows():
+    return Venue.query\
+        .with_entities(Venue.id, Venue.name, Venue.city, Venue.state, Venue.num_upcoming_shows)\
+        .order_by(Venue.state, Venue.city, Venue.id)
+
+
+def iter_venue_areas(venues):
+    # rows arrive sorted by location, so one pass builds every area
+    for (city, state), rows in groupby(venues, key=lambda venue: (venue.city, venue.state)):
+        yield {
+            "city": city,
+            "state": state,
+            "venues": [{
+                "id": venue.id,
+                "name": venue.name,
+                "num_upcoming_shows": venue.num_upcoming_shows
+            } for venue in rows]
+        }
+
+
+def venue_areas():
+    return list(iter_venue_areas(venue_rows().all()))
+
+
+@blueprint.route('/venues')
+@read_only
+@cached_page("venues", "shows")
+def venues():
+    if current_app.config["STREAM_LISTINGS"]:
+        # one area at a time from a server-side cursor
+        return stream_template('pages/venues.html',
+                               areas=iter_venue_areas(stream_rows(venue_rows())))
+    data = []
+    try:
+        data = venue_areas()
+    except:
+        flash("An error occurred")
+        abort(500)
+    return render_template('pages/venues.html', areas=data)
+
+
+@blueprint.route('/venues/search', methods=['POST'])
+@read_only
+def search_venues():
+    search_term = request.form.get("search_term", "")
+    response = search_results(
+        Venue, search_term, request.form.get("page", 1, type=int))
+    return render_template('pages/search_venues.html', results=response, search_term=search_term)
+
+
+def load_venue_schedule(venue_id):
+    # the venue, its genres and all of its shows in one round trip
+    genres = genre_names(venue_genres, venue_genres.c.venue_id, venue_id)
+    rows = Venue.query.with_entities(
+        Venue,
+        genres.c.genre_names,
+        Show.artist_id,
+        Artist.name.label("artist_name"),
+        Artist.image_link.label("artist_image_link"),
+        Show.start_time,
+    ).outerjoin(Venue.shows).outerjoin(Artist, Show.artist_id == Artist.id)\
+        .outerjoin(genres, genres.c.id == Venue.id)\
+        .options(db.lazyload(Venue.genre_rows))\
+        .filter(Venue.id == venue_id).all()
+    if(not rows):
+        return None
+    venue = rows[0].Venue
+    shows = [{
+        "artist_id": row.artist_id,
+        "artist_name": row.artist_name,
+        "artist_image_link": row.artist_image_link,
+        "start_time": row.start_time
+    } for row in rows if row.start_time is not None]
+    return ShowSchedule({
+        "id": venue.id,
+        "name": venue.name,
+        "genres": split_genre_names(rows[0].genre_names),
+        "address": venue.address,
+        "city": venue.city,
+        "state": venue.state,
+        "phone": venue.phone,
+        "website": venue.website_link,
+        "facebook_link": venue.facebook_link,
+        "seeking_talent": venue.seeking_talent,
+        "seeking_description": venue.seeking_description,
+        "image_link": venue.image_link
+    }, shows, tags={f"artist:{show['artist_id']}" for show in shows})
+
+
+@blueprint.route('/venues/<int:venue_id>')
+@read_only
+@cached_page("venue:{venue_id}")
+def show_venue(venue_id):
+    data = {}
+    try:
+        data = schedule_detail("venue", venue_id, lambda: load_venue_schedule(venue_id))
+    except ValueError as e:
+        flash(f"An error occurred: {e}")
+        abort(404)
+    except:
+        flash("An error occurred")
+        abort(500)
+    return render_template('pages/show_venue.html', venue=data)
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+
+@blueprint.route('/venues/create', methods=['GET'])
+def create_venue_form():
+    form = VenueForm()
+    return render_template('forms/new_venue.html', form=form)
+
+
+@blueprint.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+    form = VenueForm()
+    error = False
+    if form.validate_on_submit():
+        try:
+            venue = Venue(
+                name=form.name.data,
+                city=form.city.data,
+                state=form.state.data,
+                address=form.address.data,
+                phone=form.phone.data,
+                image_link=form.image_link.data,
+                genres=form.genres.data,
+                facebook_link=form.facebook_link.data,
+                website_link=form.website_link.data,
+                seeking_talent=form.seeking_talent.data,
+                seeking_description=form.seeking_description.data
+            )
+            db.session.add(venue)
+            db.session.commit()
+            invalidate_pages("venues")
+            flash('Venue ' + venue.name + ' was successfully listed!')
+        except:
+            error = True
+            db.session.rollback()
+            flash('An error occurred. Venue ' +
+                  form.name.data + ' could not be listed.')
+            print(sys.exc_info())
+        finally:
+            db.session.close()
+        if error:
+            abort(500)
+    else:
+        flash("Some fields failed validation")
+        return render_template('forms/new_venue.html', form=form)
+    return redirect(url_for("pages.index"))
+
+
+@blueprint.route('/venues/<int:venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+    error = False
+    try:
+        venue = Venue.query.get(venue_id)
+        if(venue is None):
+            flash(f"Venue does not exist: {venue_id}")
+            abort(404)
+        db.session.delete(venue)
+        db.session.commit()
+        invalidate_pages("venues", f"venue:{venue_id}")
+        flash(f"Successfully delete venue: {venue_id}")
+    except:
+        error = True
+        db.session.rollback()
+    finally:
+        db.session.close()
+    if error:
+        flash(f"Could not delete venue: {venue_id}")
+        abort(500)
+    return jsonify({"done": True})
+
+#  Update
+#  ----------------------------------------------------------------
+
+
+@blueprint.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+    venue = Venue.query.get(venue_id)
+    if (venue is None):
+        flash(f"Venue does not exist: {venue_id}")
+        abort(404)
+    form = VenueForm(obj=venue)
+    return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+
+@blueprint.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+    form = VenueForm()
+    error = False
+    if form.validate_on_submit():
+        try:
+            venue = Venue.query.get(venue_id)
+            form.populate_obj(venue)
+            db.session.commit()
+            invalidate_pages("venues", f"venue:{venue_id}")
+        except:
+            error = True
+            db.session.rollback()
+        finally:
+            db.session.close()
+    else:
+        flash("Some fields are not valid")
+        print(form.errors)
+        return redirect(url_for("venues.edit_venue", venue_id=venue_id))
+    if error:
+        flash(f"Could not edit venue: {venue_id}")
+        abort(500)
+    flash(f"Successfully edited Venue: {form.name.data}")
+    return redirect(url_for('venues.show_venue', venue_id=venue_id))
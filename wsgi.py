@@ -0,0 +1,15 @@
+"""Production entry point.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+or, under uvicorn's WSGI interface, `uvicorn --interface wsgi wsgi:app`.
+Servers that take an application factory can use `wsgi:create_app()`.
+"""
+import os
+
+# the development default is debug mode; a deployment has to opt back in
+os.environ.setdefault("DEBUG", "false")
+
+from initialise_app import create_app  # noqa: E402
+
+app = application = create_app()